@@ -0,0 +1,22 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-doctor-stats")
+@pass_context
+def rebuild_doctor_stats(context):
+    """Recompute the Doctor Stats table from Appointments and Doctor Leaves"""
+    from myhealth.myhealth.api.doctor_api import rebuild_doctor_stats
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        rebuild_doctor_stats()
+        click.echo(f"Doctor stats rebuilt for {frappe.db.count('Doctor Stats')} doctors")
+    finally:
+        frappe.destroy()
+
+
+commands = [rebuild_doctor_stats]
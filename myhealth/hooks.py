@@ -66,6 +66,20 @@ doc_events = {
 
 # ---------------------------
 
+# Permissions
+
+# ---------------------------
+
+permission_query_conditions = {
+"Medical Record": "myhealth.myhealth.api.medical_records_api.get_permission_query_conditions",
+"Lab Parameter Reading": "myhealth.myhealth.api.medical_records_api.get_lab_reading_query_conditions"
+}
+has_permission = {
+"Medical Record": "myhealth.myhealth.api.medical_records_api.has_medical_record_permission"
+}
+
+# ---------------------------
+
 # Website Routing
 
 # ---------------------------
@@ -83,7 +97,11 @@ website_route_rules = [
 scheduler_events = {
 "daily": [
 "myhealth.myhealth.api.doctor_leave_api.auto_end_expired_leaves",
-"myhealth.myhealth.api.appointment_api.send_appointment_reminders"
+"myhealth.myhealth.api.appointment_api.send_appointment_reminders",
+"myhealth.myhealth.api.appointment_api.create_recurring_appointments",
+"myhealth.myhealth.api.waitlist_api.sweep_waitlist",
+"myhealth.myhealth.api.patient_api.refresh_patient_ages",
+"myhealth.myhealth.api.doctor_api.rebuild_doctor_stats"
 ]
 }
 
@@ -1,10 +1,168 @@
+import bisect
+import json
+
 import frappe
 from frappe.model.document import Document
-from datetime import datetime
-from frappe.utils import add_days, nowdate
+from frappe.utils import add_days, cint, getdate, now, nowdate
+
+from myhealth.myhealth.api.doctor_api import adjust_doctor_stats, get_doctor_display_map, get_doctor_for_user
+from myhealth.myhealth.api.leave_index import get_doctors_on_leave, get_leave_overlap
+from myhealth.myhealth.utils import (
+    bulk_insert_rows,
+    chunked,
+    date_key,
+    format_seconds,
+    reserve_names,
+    to_seconds,
+)
 
 # In myhealth/myhealth/api/appointment_api.py
 
+
+class BookedSlotIndex:
+    """
+    Per doctor, per date sorted index of booked appointment intervals.
+
+    Intervals are half-open [start, end) in seconds since midnight, so 09:00-09:30
+    and 09:30-10:00 do not conflict but 09:00-09:30 and 09:15-09:45 do.
+    """
+
+    def __init__(self):
+        # (doctor, date) -> {"starts": [], "ends": [], "names": [], "max_ends": []}
+        self._days = {}
+
+    @classmethod
+    def load(cls, doctor_dates, exclude=None):
+        """Build an index for the given (doctor, date) pairs with a single query"""
+        index = cls()
+        pairs = {(doctor, date_key(date)) for doctor, date in doctor_dates if doctor and date}
+        if not pairs:
+            return index
+
+        rows = frappe.db.sql(
+            """
+            SELECT name, doctor, appointment_date, start_time, end_time
+            FROM `tabAppointment`
+            WHERE doctor IN %(doctors)s
+                AND appointment_date IN %(dates)s
+                AND IFNULL(status, '') != 'Cancelled'
+                AND IFNULL(service_status, '') != 'Cancelled'
+                AND IFNULL(displaced_by_leave, '') = ''
+                AND name NOT IN %(exclude)s
+            """,
+            {
+                "doctors": tuple({doctor for doctor, _ in pairs}),
+                "dates": tuple({date for _, date in pairs}),
+                "exclude": tuple(exclude or [""]),
+            },
+            as_dict=True,
+        )
+
+        for row in rows:
+            key = (row.doctor, date_key(row.appointment_date))
+            if key in pairs:
+                index.add(row.doctor, row.appointment_date, row.start_time, row.end_time, row.name)
+        return index
+
+    def add(self, doctor, date, start_time, end_time, name=None):
+        """Insert a booked interval, keeping the day's lists sorted by start"""
+        start, end = to_seconds(start_time), to_seconds(end_time)
+        if start is None or end is None:
+            return
+
+        day = self._days.setdefault(
+            (doctor, date_key(date)), {"starts": [], "ends": [], "names": [], "max_ends": []}
+        )
+        pos = bisect.bisect_right(day["starts"], start)
+        day["starts"].insert(pos, start)
+        day["ends"].insert(pos, end)
+        day["names"].insert(pos, name)
+        day["max_ends"].insert(pos, end)
+
+        # max_ends[i] is the latest end among intervals 0..i, which lets
+        # conflicts() stop scanning as soon as nothing earlier can reach `start`
+        running = day["max_ends"][pos - 1] if pos else 0
+        for i in range(pos, len(day["starts"])):
+            running = max(running, day["ends"][i])
+            day["max_ends"][i] = running
+
+    def conflicts(self, doctor, date, start_time, end_time):
+        """Return names of booked intervals overlapping [start_time, end_time)"""
+        day = self._days.get((doctor, date_key(date)))
+        if not day:
+            return []
+
+        start, end = to_seconds(start_time), to_seconds(end_time)
+        # Only intervals starting before `end` can overlap
+        i = bisect.bisect_left(day["starts"], end) - 1
+
+        found = []
+        while i >= 0 and day["max_ends"][i] > start:
+            if day["ends"][i] > start:
+                found.append(day["names"][i])
+            i -= 1
+        return found
+
+    def intervals(self, doctor, date):
+        """Return the sorted (start, end) intervals booked for a doctor on a date"""
+        day = self._days.get((doctor, date_key(date)))
+        if not day:
+            return []
+        return list(zip(day["starts"], day["ends"], strict=True))
+
+
+def validate_slot_times(start_time, end_time):
+    """Throw if a proposed slot does not end after it starts"""
+    start, end = to_seconds(start_time), to_seconds(end_time)
+    if start is None or end is None:
+        frappe.throw("Start time and end time are required.")
+    if end <= start:
+        frappe.throw(f"End time {format_seconds(end)} must be after start time {format_seconds(start)}.")
+
+
+def get_slot_conflicts(doctor, appointment_date, start_time, end_time, exclude=None):
+    """Return names of active appointments overlapping the given slot"""
+    index = BookedSlotIndex.load([(doctor, appointment_date)], exclude=exclude)
+    return index.conflicts(doctor, appointment_date, start_time, end_time)
+
+
+@frappe.whitelist(allow_guest=False)
+def validate_slots(slots):
+    """
+    Check many proposed slots in one call.
+
+    `slots` is a list (or JSON list) of {doctor, appointment_date, start_time, end_time}.
+    Each slot is checked against approved leave, booked appointments and the
+    earlier slots in the same batch, so a schedule can be validated before it is booked.
+    """
+    if isinstance(slots, str):
+        slots = json.loads(slots)
+
+    pairs = [(s.get("doctor"), s.get("appointment_date")) for s in slots]
+    index = BookedSlotIndex.load(pairs)
+    on_leave = get_doctors_on_leave(pairs)
+
+    results = []
+    for i, slot in enumerate(slots):
+        start, end = to_seconds(slot.get("start_time")), to_seconds(slot.get("end_time"))
+        if not slot.get("doctor") or not slot.get("appointment_date") or start is None or end is None or end <= start:
+            results.append({"index": i, "available": False, "conflicts": [], "message": "Invalid slot"})
+            continue
+
+        if (slot["doctor"], slot["appointment_date"]) in on_leave:
+            results.append({"index": i, "available": False, "conflicts": [], "message": "Doctor is on leave"})
+            continue
+
+        conflicts = index.conflicts(slot["doctor"], slot["appointment_date"], start, end)
+        available = not conflicts
+        if available:
+            index.add(slot["doctor"], slot["appointment_date"], start, end, f"slot-{i}")
+
+        results.append({"index": i, "available": available, "conflicts": conflicts})
+
+    return {"slots": results}
+
+
 @frappe.whitelist(allow_guest=False)
 def create_appointment(patient, doctor, service, appointment_date, start_time, end_time, notes=None):
     """Create a new appointment (with double-booking prevention)"""
@@ -19,21 +177,10 @@ def create_appointment(patient, doctor, service, appointment_date, start_time, e
          frappe.throw(f"Patient ID {patient_id} does not exist. Please check the Patient DocType.")
     # --- CRITICAL FIX END ---
     
-    # Check if doctor is already booked at that date and time
-    existing = frappe.get_all(
-        "Appointment",
-        filters={
-            "doctor": doctor,
-            "appointment_date": appointment_date,
-            "start_time": start_time,
-            "end_time": end_time,
-            "service_status": ["!=", "Cancelled"]
-        },
-        fields=["name", "service_status"]
-    )
-
-    if existing:
-        frappe.throw(f"Doctor already has an appointment at {appointment_date} {start_time} {end_time}")
+    # Check if doctor already has an overlapping appointment
+    validate_slot_times(start_time, end_time)
+    if get_slot_conflicts(doctor, appointment_date, start_time, end_time):
+        frappe.throw(f"Doctor already has an appointment overlapping {appointment_date} {start_time} {end_time}")
 
     # Otherwise, create new appointment
     doc = frappe.get_doc({
@@ -58,56 +205,81 @@ def create_appointment(patient, doctor, service, appointment_date, start_time, e
 # FETCH Appointments (optionally filter by patient)
 @frappe.whitelist(allow_guest=False)
 def get_appointments(patient_id=None, service_status=None, doctor=None,
-                     date=None, start_date=None, end_date=None, search=None):
-    """Fetch appointments with advanced filters + patient search"""
-    filters = {}
+                     date=None, start_date=None, end_date=None, search=None,
+                     limit=None, offset=0):
+    """Fetch appointments with advanced filters + patient search.
+
+    Patient details are joined in the same query and `search` is matched in SQL,
+    so a page of appointments costs one query plus one count query.
+    """
+    conditions = []
+    values = {}
 
     # Basic filters
     if patient_id:
-        filters["patient"] = patient_id
+        conditions.append("a.patient = %(patient)s")
+        values["patient"] = patient_id
     if service_status:
-        filters["service_status"] = service_status
+        conditions.append("a.service_status = %(service_status)s")
+        values["service_status"] = service_status
     if doctor:
-        filters["doctor"] = doctor
+        conditions.append("a.doctor = %(doctor)s")
+        values["doctor"] = doctor
     if date:
-        filters["appointment_date"] = date
-    if start_date and end_date:
-        filters["appointment_date"] = ["between", [start_date, end_date]]
-
-    # Get appointments that match the base filters
-    appointments = frappe.get_all(
-        "Appointment",
-        filters=filters,
-        fields=["name", "patient", "doctor", "service", "service_status",
-                "appointment_date", "start_time", "end_time", "notes"]
+        conditions.append("a.appointment_date = %(date)s")
+        values["date"] = date
+    if start_date:
+        conditions.append("a.appointment_date >= %(start_date)s")
+        values["start_date"] = start_date
+    if end_date:
+        conditions.append("a.appointment_date <= %(end_date)s")
+        values["end_date"] = end_date
+
+    # Search on patient name / email
+    if search:
+        conditions.append(
+            "(p.first_name LIKE %(search)s OR p.last_name LIKE %(search)s OR p.email LIKE %(search)s)"
+        )
+        values["search"] = f"%{search}%"
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    from_clause = "FROM `tabAppointment` a LEFT JOIN `tabPatient` p ON p.name = a.patient"
+
+    total = frappe.db.sql(f"SELECT COUNT(*) {from_clause} {where}", values)[0][0]
+
+    paging = ""
+    if limit:
+        paging = "LIMIT %(limit)s OFFSET %(offset)s"
+        values["limit"] = cint(limit)
+        values["offset"] = cint(offset)
+
+    rows = frappe.db.sql(
+        f"""
+        SELECT a.name, a.patient, a.doctor, a.service, a.service_status,
+            a.appointment_date, a.start_time, a.end_time, a.notes,
+            p.first_name, p.last_name, p.age, p.gender, p.email
+        {from_clause}
+        {where}
+        ORDER BY a.appointment_date DESC, a.start_time ASC, a.name DESC
+        {paging}
+        """,
+        values,
+        as_dict=True,
     )
 
     results = []
-    for a in appointments:
-        patient = frappe.get_doc("Patient", a.get("patient"))
-
+    for row in rows:
         # Attach patient info
-        a["patient_info"] = {
-            "first_name": patient.get("first_name"),
-            "last_name": patient.get("last_name"),
-            "age": patient.get("age"),
-            "gender": patient.get("gender"),
-            "email": patient.get("email")
+        row["patient_info"] = {
+            "first_name": row.pop("first_name"),
+            "last_name": row.pop("last_name"),
+            "age": row.pop("age"),
+            "gender": row.pop("gender"),
+            "email": row.pop("email")
         }
+        results.append(row)
 
-        # Search filter
-        if search:
-            search_lower = search.lower()
-            if (
-                search_lower in str(patient.first_name).lower()
-                or search_lower in str(patient.last_name).lower()
-                or search_lower in str(patient.email).lower()
-            ):
-                results.append(a)
-        else:
-            results.append(a)
-
-    return {"appointments": results}
+    return {"appointments": results, "total": total, "limit": cint(limit), "offset": cint(offset)}
 
 # UPDATE Appointment
 @frappe.whitelist(allow_guest=False)
@@ -130,31 +302,96 @@ def cancel_appointment(name):
     frappe.db.commit()
     return {"message": f"Appointment {name} marked as Cancelled"}
 
-@frappe.whitelist(allow_guest=False)
-def get_appointment_summary():
-    """Return summary statistics for appointments"""
+NO_STATUS = "Not Set"
+
+
+def _summary_from_counts(counts):
     summary = {
-        "total_appointments": 0,
+        "total_appointments": sum(counts.values()),
         "pending": 0,
         "completed": 0,
         "cancelled": 0
     }
+    for status, count in counts.items():
+        key = (status or "").lower()
+        if key in summary:
+            summary[key] += count
+    return summary
+
+
+def update_status_counter(service_status, delta):
+    """Atomically add `delta` to the materialized count for a service status"""
+    if not delta or not cint(frappe.db.get_single_value("My Health Settings", "use_appointment_counters")):
+        return
+    key = service_status or NO_STATUS
+    now_ts = now()
+    frappe.db.sql(
+        """
+        INSERT INTO `tabAppointment Status Count`
+            (name, service_status, appointment_count, creation, modified, owner, modified_by)
+        VALUES (%(key)s, %(key)s, %(delta)s, %(now)s, %(now)s, 'Administrator', 'Administrator')
+        ON DUPLICATE KEY UPDATE appointment_count = appointment_count + %(delta)s, modified = %(now)s
+        """,
+        {"key": key, "delta": delta, "now": now_ts},
+    )
+
+
+def rebuild_status_counters():
+    """Recount the materialized status counters from the Appointment table"""
+    counts = _count_by_status()
+    frappe.db.delete("Appointment Status Count")
+    now_ts = now()
+    frappe.db.bulk_insert(
+        "Appointment Status Count",
+        ["name", "service_status", "appointment_count", "creation", "modified", "owner", "modified_by"],
+        [
+            (status or NO_STATUS, status or NO_STATUS, count, now_ts, now_ts, "Administrator", "Administrator")
+            for status, count in counts.items()
+        ],
+    )
 
-    # Get all appointments
-    all_appointments = frappe.get_all("Appointment", fields=["service_status"])
-    summary["total_appointments"] = len(all_appointments)
 
-    # Count by status
-    for appt in all_appointments:
-        status = appt.get("service_status", "").lower()
-        if status == "pending":
-            summary["pending"] += 1
-        elif status == "completed":
-            summary["completed"] += 1
-        elif status == "cancelled":
-            summary["cancelled"] += 1
+def _count_by_status(doctor=None, patient=None, from_date=None, to_date=None):
+    conditions = []
+    values = {}
+    if doctor:
+        conditions.append("doctor = %(doctor)s")
+        values["doctor"] = doctor
+    if patient:
+        conditions.append("patient = %(patient)s")
+        values["patient"] = patient
+    if from_date:
+        conditions.append("appointment_date >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("appointment_date <= %(to_date)s")
+        values["to_date"] = to_date
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = frappe.db.sql(
+        f"SELECT service_status, COUNT(*) FROM `tabAppointment` {where} GROUP BY service_status",
+        values,
+    )
+    return {status: count for status, count in rows}
 
-    return {"summary": summary}
+
+@frappe.whitelist(allow_guest=False)
+def get_appointment_summary(doctor=None, patient=None, from_date=None, to_date=None):
+    """
+    Return summary statistics for appointments.
+
+    Counts come from a single GROUP BY query; the unfiltered summary is read
+    from the Appointment Status Count table when counters are enabled.
+    """
+    if not any((doctor, patient, from_date, to_date)) and cint(
+        frappe.db.get_single_value("My Health Settings", "use_appointment_counters")
+    ):
+        rows = frappe.get_all("Appointment Status Count", fields=["service_status", "appointment_count"])
+        counts = {r.service_status: r.appointment_count for r in rows}
+    else:
+        counts = _count_by_status(doctor, patient, from_date, to_date)
+
+    return {"summary": _summary_from_counts(counts)}
 
 class Appointment(Document):
     def validate(self):
@@ -167,28 +404,14 @@ class Appointment(Document):
         if not self.doctor or not self.appointment_date:
             return
 
-        # Convert string to date if needed
-        appointment_date = self.appointment_date
-        if isinstance(appointment_date, str):
-            appointment_date = datetime.strptime(appointment_date, "%Y-%m-%d").date()
-
-        # Get approved leaves that overlap with this date
-        overlapping_leave = frappe.get_all(
-            "Doctor Leave",
-            filters={
-                "doctor": self.doctor,
-                "status": "Approved",
-                "leave_start": ("<=", appointment_date),
-                "leave_end": (">=", appointment_date)
-            },
-            fields=["name", "leave_start", "leave_end"]
-        )
+        # Served from the in-process leave index instead of a query per call
+        leave = get_leave_overlap(self.doctor, self.appointment_date)
 
-        if overlapping_leave:
-            leave = overlapping_leave[0]
+        if leave:
+            leave_start, leave_end = leave
             frappe.throw(
                 f"❌ Doctor {self.doctor} is on approved leave "
-                f"from {leave.leave_start} to {leave.leave_end}. "
+                f"from {leave_start} to {leave_end}. "
                 f"Please select another date or doctor."
             )
 
@@ -209,9 +432,11 @@ def get_patient_appointments(patient=None):
         fields=["name", "doctor", "service", "service_status", "appointment_date", "start_time", "end_time"]
     )
 
+    doctors = get_doctor_display_map(a.get("doctor") for a in appointments)
+
     results = []
     for a in appointments:
-        doctor_name = frappe.db.get_value("Doctor", a.get("doctor"), "full_name") or a.get("doctor")
+        doctor_name = doctors.get(a.get("doctor"), {}).get("full_name") or a.get("doctor")
         results.append({
             "name": a.get("name"),
             "doctor": a.get("doctor"),
@@ -225,32 +450,50 @@ def get_patient_appointments(patient=None):
     return results
 
 @frappe.whitelist(allow_guest=False)
-def get_calendar_events():
+def get_calendar_events(start=None, end=None, updated_since=None):
     """
     Fetch appointments for the logged-in doctor only,
     including start_time and end_time.
+
+    `start`/`end` limit the result to the visible calendar window; `end` is
+    exclusive, as FullCalendar sends it. With `updated_since` only events
+    modified after that timestamp are returned, plus `{"name", "removed": 1}`
+    tombstones for appointments deleted or moved out of the window since then.
     """
-    user = frappe.session.user
+    doctor = get_doctor_for_user()
+    if not doctor:
+        return []
 
-    # First try match by email
-    doctor = frappe.db.get_value("Doctor", {"email": user}, "name")
+    window_start = getdate(start) if start else None
+    window_end = getdate(end) if end else None
 
-    # If no match, try full_name
-    if not doctor:
-        full_name = frappe.db.get_value("User", user, "full_name")
-        doctor = frappe.db.get_value("Doctor", {"full_name": full_name}, "name")
+    def in_window(date):
+        date = getdate(date)
+        return (not window_start or date >= window_start) and (not window_end or date < window_end)
 
-    if not doctor:
-        return []
+    filters = [["doctor", "=", doctor]]
+    if updated_since:
+        # Changed rows are read regardless of date so moves out of the window show up
+        filters.append(["modified", ">", updated_since])
+    else:
+        if window_start:
+            filters.append(["appointment_date", ">=", window_start])
+        if window_end:
+            filters.append(["appointment_date", "<", window_end])
 
     appointments = frappe.get_all(
         "Appointment",
-        filters={"doctor": doctor},
-        fields=["name", "patient", "service", "appointment_date", "start_time", "end_time", "status"]
+        filters=filters,
+        fields=["name", "patient", "service", "appointment_date", "start_time", "end_time",
+                "status", "service_status", "modified"]
     )
 
     events = []
     for a in appointments:
+        if not in_window(a.appointment_date):
+            events.append({"name": a.name, "removed": 1, "modified": a.modified})
+            continue
+
         start = f"{a.appointment_date}T{a.start_time}"
         end = f"{a.appointment_date}T{a.end_time}"
 
@@ -265,28 +508,230 @@ def get_calendar_events():
             "title": f"{a.patient} - {a.service}",
             "start": start,
             "end": end,
-            "color": color
+            "color": color,
+            "status": a.status,
+            "service_status": a.service_status,
+            "modified": a.modified
         })
 
+    if updated_since:
+        # Names the client has not cached are simply ignored, so no doctor filter is needed
+        deleted = frappe.get_all(
+            "Deleted Document",
+            filters={"deleted_doctype": "Appointment", "creation": [">", updated_since]},
+            fields=["deleted_name", "creation"],
+        )
+        events.extend({"name": d.deleted_name, "removed": 1, "modified": d.creation} for d in deleted)
+
     return events
 
 @frappe.whitelist(allow_guest=False)
 def check_availability(doctor, appointment_date, start_time, end_time):
     """Check if a doctor is available at the given time"""
-    existing = frappe.db.exists(
-        "Appointment",
-        {
-            "doctor": doctor,
-            "appointment_date": appointment_date,
-            "start_time": start_time,
-            "end_time": end_time,
-            "status": ["!=", "Cancelled"]
-        }
-    )
-    if existing:
+    validate_slot_times(start_time, end_time)
+    if get_slot_conflicts(doctor, appointment_date, start_time, end_time):
         return {"available": False, "message": "Doctor is already booked at that time."}
     return {"available": True, "message": "Doctor is available."}
 
+REMINDER_CHUNK_SIZE = 200
+
+
+def send_appointment_reminders():
+    """
+    Queue reminders for tomorrow's appointments.
+
+    Only names are read here; each chunk is rendered, sent and marked by a
+    background job so the scheduler worker is released immediately.
+    """
+    tomorrow = add_days(nowdate(), 1)
+    names = frappe.get_all(
+        "Appointment",
+        filters={
+            "appointment_date": tomorrow,
+            "reminder_sent": 0,
+            "status": ["not in", ["Cancelled", "Completed"]],
+            "service_status": ["!=", "Cancelled"],
+            "displaced_by_leave": ["is", "not set"],
+        },
+        pluck="name",
+        order_by="name asc",
+    )
+
+    for i in range(0, len(names), REMINDER_CHUNK_SIZE):
+        chunk = names[i:i + REMINDER_CHUNK_SIZE]
+        frappe.enqueue(
+            "myhealth.myhealth.api.appointment_api.send_reminder_batch",
+            queue="short",
+            names=chunk,
+            job_id=f"appointment_reminders:{tomorrow}:{chunk[0]}",
+            deduplicate=True,
+        )
+
+
+def send_reminder_batch(names):
+    """
+    Send reminders for a chunk of appointments and flag them in one UPDATE.
+
+    Rows already flagged are skipped and the Email Queue entries commit together
+    with the flag, so re-running a chunk after a crash never double-sends.
+    """
+    if not names:
+        return
+
+    rows = frappe.db.sql(
+        """
+        SELECT a.name, a.appointment_date, a.start_time, a.end_time, a.service,
+            p.email AS patient_email, p.full_name AS patient_name, d.full_name AS doctor_name
+        FROM `tabAppointment` a
+        LEFT JOIN `tabPatient` p ON p.name = a.patient
+        LEFT JOIN `tabDoctor` d ON d.name = a.doctor
+        WHERE a.name IN %(names)s AND a.reminder_sent = 0
+        FOR UPDATE
+        """,
+        {"names": tuple(names)},
+        as_dict=True,
+    )
+    if not rows:
+        return
+
+    for appt in rows:
+        if not appt.patient_email:
+            continue
+        frappe.sendmail(
+            recipients=appt.patient_email,
+            subject=f"Reminder: Appointment with {appt.doctor_name or 'your doctor'} Tomorrow",
+            message=(
+                f"Hi {appt.patient_name or ''}, this is a reminder that you have an appointment "
+                f"on {appt.appointment_date} at {appt.start_time}."
+            ),
+            reference_doctype="Appointment",
+            reference_name=appt.name,
+        )
+
+    frappe.db.sql(
+        "UPDATE `tabAppointment` SET reminder_sent = 1 WHERE name IN %(names)s",
+        {"names": tuple(appt.name for appt in rows)},
+    )
+    frappe.db.commit()
+
+RECURRING_CHUNK_SIZE = 200
+DEFAULT_RECURRING_HORIZON_DAYS = 30
+
+
+def create_recurring_appointments():
+    """Scheduled entry point: materialize recurring series from a background job"""
+    frappe.enqueue(
+        "myhealth.myhealth.api.appointment_api.materialize_recurring_appointments",
+        queue="long",
+        job_id="materialize_recurring_appointments",
+        deduplicate=True,
+    )
+
+
+def materialize_recurring_appointments(horizon_days=None):
+    """
+    Create the missing occurrences of every recurring series up to the horizon.
+
+    Existing occurrences (linked through recurrence_parent) and days the doctor is
+    on leave are skipped, the whole batch is conflict-checked in memory and new rows are bulk-inserted in chunks.
+    """
+    from myhealth.myhealth.api.availability_api import clear_slot_cache
+
+    today = getdate(nowdate())
+    horizon_days = cint(horizon_days) or cint(
+        frappe.db.get_single_value("My Health Settings", "recurring_horizon_days")
+    ) or DEFAULT_RECURRING_HORIZON_DAYS
+    horizon = getdate(add_days(today, horizon_days))
+
+    series = frappe.get_all(
+        "Appointment",
+        filters={
+            "is_recurring": 1,
+            "recurrence_interval": [">", 0],
+            "recurrence_parent": ["is", "not set"],
+            "status": ["!=", "Cancelled"],
+            "service_status": ["!=", "Cancelled"],
+        },
+        fields=["name", "patient", "doctor", "service", "appointment_date", "start_time",
+                "end_time", "recurrence_interval", "recurrence_end"],
+    )
+    if not series:
+        return {"created": 0, "conflicts": 0, "on_leave": 0}
+
+    # Cancelled occurrences count as existing so they are not re-created. Only the
+    # window being proposed matters, so past occurrences are never read.
+    existing = {
+        (row.recurrence_parent, date_key(row.appointment_date))
+        for row in frappe.get_all(
+            "Appointment",
+            filters=[
+                ["recurrence_parent", "in", [s.name for s in series]],
+                ["appointment_date", ">=", today],
+                ["appointment_date", "<=", horizon],
+            ],
+            fields=["recurrence_parent", "appointment_date"],
+        )
+    }
+
+    proposed = []
+    for s in series:
+        interval = cint(s.recurrence_interval)
+        last = min(horizon, getdate(s.recurrence_end)) if s.recurrence_end else horizon
+        next_date = getdate(add_days(s.appointment_date, interval))
+        if next_date < today:
+            # jump straight to the first occurrence on or after today
+            skipped = -(-(today - next_date).days // interval)
+            next_date = getdate(add_days(next_date, skipped * interval))
+        while next_date <= last:
+            if (s.name, date_key(next_date)) not in existing:
+                proposed.append((s, next_date))
+            next_date = getdate(add_days(next_date, interval))
+
+    index = BookedSlotIndex.load([(s.doctor, date) for s, date in proposed])
+    on_leave = get_doctors_on_leave((s.doctor, date) for s, date in proposed)
+    rows = []
+    conflicts = 0
+    skipped_for_leave = 0
+    for s, date in proposed:
+        if (s.doctor, date) in on_leave:
+            skipped_for_leave += 1
+            continue
+        if index.conflicts(s.doctor, date, s.start_time, s.end_time):
+            conflicts += 1
+            continue
+        index.add(s.doctor, date, s.start_time, s.end_time)
+        rows.append({
+            "patient": s.patient,
+            "doctor": s.doctor,
+            "service": s.service,
+            "appointment_date": date,
+            "start_time": s.start_time,
+            "end_time": s.end_time,
+            "status": "Scheduled",
+            "service_status": "Pending",
+            "recurrence_parent": s.name,
+            "is_recurring": 0,
+            "reminder_sent": 0,
+            "confirmation_sent": 0,
+        })
+
+    for chunk in chunked(rows, RECURRING_CHUNK_SIZE):
+        for row, name in zip(chunk, reserve_names("APT.###", len(chunk)), strict=True):
+            row["name"] = name
+        bulk_insert_rows("Appointment", chunk)
+        update_status_counter("Pending", len(chunk))
+        frappe.db.commit()
+
+    for doctor in {row["doctor"] for row in rows}:
+        clear_slot_cache(doctor, [row["appointment_date"] for row in rows if row["doctor"] == doctor])
+    # Every new occurrence is upcoming and its patient already has the series parent
+    for doctor in {row["doctor"] for row in rows}:
+        created = sum(1 for row in rows if row["doctor"] == doctor)
+        adjust_doctor_stats(doctor, {"total_appointments": created, "upcoming_appointments": created})
+    frappe.db.commit()
+
+    return {"created": len(rows), "conflicts": conflicts, "on_leave": skipped_for_leave}
+
 @frappe.whitelist(allow_guest=False)
 def get_patient_id_for_user():
     """Maps the logged-in User ID (email/username) to the Patient DocType Name."""
@@ -0,0 +1,180 @@
+import json
+from functools import partial
+
+import frappe
+from frappe.utils import add_days, cint, date_diff, getdate, now_datetime, nowdate
+
+from myhealth.myhealth.api.appointment_api import BookedSlotIndex
+from myhealth.myhealth.api.leave_index import get_doctors_on_leave
+from myhealth.myhealth.utils import date_key, format_seconds, to_seconds
+
+SLOT_CACHE_KEY = "myhealth:free_slots"
+DEFAULT_SLOT_DURATION = 30
+MAX_SLOT_RANGE_DAYS = 62
+
+
+def _slot_cache_key(doctor):
+    return f"{SLOT_CACHE_KEY}:{doctor}"
+
+
+def _evict_slot_cache(doctor, dates=None):
+    if dates is None:
+        frappe.cache.delete_value(_slot_cache_key(doctor))
+        return
+    for date in dates:
+        frappe.cache.hdel(_slot_cache_key(doctor), date_key(date))
+
+
+def clear_slot_cache(doctor, dates=None):
+    """
+    Drop cached free slots for a doctor, either for some dates or for every day.
+
+    Evicts now, so this transaction re-reads its own writes, and again after
+    commit, so a concurrent read cannot re-cache the pre-commit rows.
+    """
+    if not doctor:
+        return
+    if dates is not None:
+        dates = [date for date in dates if date]
+    _evict_slot_cache(doctor, dates)
+    frappe.db.after_commit.add(partial(_evict_slot_cache, doctor, dates))
+
+
+def get_default_slot_duration():
+    """Slot length in minutes used when an availability block does not set one"""
+    return cint(frappe.db.get_single_value("My Health Settings", "default_appointment_duration")) or DEFAULT_SLOT_DURATION
+
+
+def _expand_windows(doctor, date, windows, booked, default_duration):
+    """
+    Cut a doctor's availability windows for one day into slots and drop the ones
+    overlapping a booked appointment.
+
+    `windows` is a list of (start, end, duration_minutes) in seconds since midnight
+    and `booked` a BookedSlotIndex covering the day.
+    """
+    candidates = set()
+    for start, end, duration in windows:
+        step = (duration or default_duration) * 60
+        slot_start = start
+        while slot_start + step <= end:
+            candidates.add((slot_start, slot_start + step))
+            slot_start += step
+
+    return [
+        {"start_time": format_seconds(slot_start), "end_time": format_seconds(slot_end)}
+        for slot_start, slot_end in sorted(candidates)
+        if not booked.conflicts(doctor, date, slot_start, slot_end)
+    ]
+
+
+def compute_free_slots(doctors, from_date, to_date):
+    """
+    Compute free slots for every doctor/day in the range without the cache.
+
+    Availability and booked appointments are each loaded with one query and
+    approved leaves come from the leave index; the per-day subtraction happens
+    in memory.
+    Returns {doctor: {date: [slots]}} with an entry for every requested day.
+    """
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    dates = [date_key(add_days(from_date, i)) for i in range(date_diff(to_date, from_date) + 1)]
+    result = {doctor: {date: [] for date in dates} for doctor in doctors}
+    if not doctors or not dates:
+        return result
+
+    windows = frappe.db.sql(
+        """
+        SELECT doctor, date, start_time, end_time, slot_duration
+        FROM `tabDoctor Availability`
+        WHERE doctor IN %(doctors)s
+            AND date BETWEEN %(from_date)s AND %(to_date)s
+            AND IFNULL(status, 'Active') != 'Disabled'
+        """,
+        {"doctors": tuple(doctors), "from_date": from_date, "to_date": to_date},
+        as_dict=True,
+    )
+
+    on_leave = {
+        (doctor, date_key(day))
+        for doctor, day in get_doctors_on_leave({(w.doctor, w.date) for w in windows})
+    }
+
+    windows_by_day = {}
+    for w in windows:
+        key = (w.doctor, date_key(w.date))
+        if key in on_leave:
+            continue
+        start, end = to_seconds(w.start_time), to_seconds(w.end_time)
+        if start is None or end is None or end <= start:
+            continue
+        windows_by_day.setdefault(key, []).append((start, end, cint(w.slot_duration)))
+
+    booked = BookedSlotIndex.load(windows_by_day.keys())
+    default_duration = get_default_slot_duration()
+
+    for (doctor, date), day_windows in windows_by_day.items():
+        result[doctor][date] = _expand_windows(doctor, date, day_windows, booked, default_duration)
+
+    return result
+
+
+def get_free_slots(doctors, from_date, to_date):
+    """
+    Free slots per doctor/day, served from the per doctor-day cache and computed
+    in one pass for whatever is missing. Slots earlier today are dropped.
+    """
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    dates = [date_key(add_days(from_date, i)) for i in range(date_diff(to_date, from_date) + 1)]
+
+    slots = {}
+    missing = set()
+    for d in doctors:
+        slots[d] = {}
+        for date in dates:
+            cached = frappe.cache.hget(_slot_cache_key(d), date)
+            if cached is None:
+                missing.add((d, date))
+            else:
+                slots[d][date] = cached
+
+    if missing:
+        missing_doctors = sorted({d for d, _ in missing})
+        missing_dates = sorted({date for _, date in missing})
+        computed = compute_free_slots(missing_doctors, missing_dates[0], missing_dates[-1])
+        for d, date in missing:
+            slots[d][date] = computed[d][date]
+            frappe.cache.hset(_slot_cache_key(d), date, computed[d][date])
+
+    # Slots earlier today are still cached but can no longer be booked
+    now = now_datetime()
+    today, now_seconds = date_key(now), to_seconds(now.time())
+    for d in doctors:
+        if today in slots[d]:
+            slots[d][today] = [s for s in slots[d][today] if to_seconds(s["start_time"]) > now_seconds]
+
+    return slots
+
+
+@frappe.whitelist(allow_guest=False)
+def get_available_slots(doctor=None, doctors=None, from_date=None, to_date=None):
+    """
+    Return bookable slots for one or many doctors over a date range.
+
+    Each doctor/day is cached until an Appointment, Doctor Leave or Doctor
+    Availability change for that doctor invalidates it.
+    """
+    if isinstance(doctors, str):
+        doctors = json.loads(doctors)
+    doctors = list(dict.fromkeys((doctors or []) + ([doctor] if doctor else [])))
+    if not doctors:
+        frappe.throw("Please select at least one doctor.")
+
+    from_date = getdate(from_date or nowdate())
+    to_date = getdate(to_date or from_date)
+    if to_date < from_date:
+        frappe.throw("To date cannot be before from date.")
+    if date_diff(to_date, from_date) >= MAX_SLOT_RANGE_DAYS:
+        frappe.throw(f"Slots can be requested for at most {MAX_SLOT_RANGE_DAYS} days at a time.")
+
+    return {"slots": get_free_slots(doctors, from_date, to_date)}
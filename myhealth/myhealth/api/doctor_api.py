@@ -1,5 +1,92 @@
+import base64
+import csv
+import io
+import json
+import re
+
 import frappe
-from frappe.utils import getdate
+from frappe.utils import add_days, cint, date_diff, getdate, now, nowdate, validate_email_address
+
+from myhealth.myhealth.utils import bulk_insert_rows, chunked, reserve_names
+
+DOCTOR_CACHE_KEY = "myhealth:doctor_display"
+DOCTOR_DISPLAY_FIELDS = [
+    "name", "full_name", "first_name", "last_name", "email",
+    "availability_status", "department", "doctor_category", "is_active"
+]
+
+
+def get_doctor_display_map(doctors):
+    """
+    Resolve many doctor IDs to their display fields.
+
+    Hits come from the frappe.cache hash; all misses are loaded with a single
+    query and written back. Doctor.on_update/on_trash evict stale entries.
+    """
+    doctors = {d for d in doctors if d}
+    result = {}
+    missing = []
+    for doctor in doctors:
+        cached = frappe.cache.hget(DOCTOR_CACHE_KEY, doctor)
+        if cached is None:
+            missing.append(doctor)
+        else:
+            result[doctor] = cached
+
+    if missing:
+        rows = frappe.get_all(
+            "Doctor",
+            filters={"name": ["in", missing]},
+            fields=DOCTOR_DISPLAY_FIELDS,
+        )
+        for row in rows:
+            result[row.name] = dict(row)
+            frappe.cache.hset(DOCTOR_CACHE_KEY, row.name, dict(row))
+
+    return result
+
+
+USER_DOCTOR_CACHE_PREFIX = "myhealth:user_doctor:"
+
+
+def get_doctor_for_user(user=None):
+    """
+    Map a session user to their Doctor ID (or None), cached per user.
+
+    Matches the Doctor's linked user first, then email, then the User's full name.
+    """
+    user = user or frappe.session.user
+    key = f"{USER_DOCTOR_CACHE_PREFIX}{user}"
+    doctor = frappe.cache.get_value(key)
+    if doctor is not None:
+        return doctor or None
+
+    doctor = frappe.db.get_value("Doctor", {"user": user}, "name")
+    if not doctor:
+        doctor = frappe.db.get_value("Doctor", {"email": user}, "name")
+    if not doctor:
+        full_name = frappe.db.get_value("User", user, "full_name")
+        if full_name:
+            doctor = frappe.db.get_value("Doctor", {"full_name": full_name}, "name")
+
+    # Cache misses too, so non-doctor users don't repeat the lookups
+    frappe.cache.set_value(key, doctor or "", expires_in_sec=3600)
+    return doctor
+
+
+def clear_doctor_cache(doctors=None):
+    """Evict cached display fields for some doctors, or for all of them"""
+    # Any doctor change can alter which user maps to which doctor and any search result
+    frappe.cache.delete_keys(USER_DOCTOR_CACHE_PREFIX)
+    frappe.cache.delete_keys(DOCTOR_SEARCH_CACHE_PREFIX)
+    if doctors is None:
+        frappe.cache.delete_value(DOCTOR_CACHE_KEY)
+        return
+    if isinstance(doctors, str):
+        doctors = [doctors]
+    for doctor in doctors:
+        frappe.cache.hdel(DOCTOR_CACHE_KEY, doctor)
+
 
 # ✅ Create a new doctor
 @frappe.whitelist(allow_guest=False)
@@ -33,6 +120,263 @@ def create_doctor(first_name, last_name, email, specialization=None, qualificati
     }
 
 
+BULK_DOCTOR_CHUNK_SIZE = 200
+BULK_DOCTOR_ENQUEUE_THRESHOLD = 500
+BULK_DOCTOR_FIELDS = [
+    "first_name", "last_name", "email", "phone_number", "availability_status", "years_of_experience",
+    "bio", "department", "qualifications", "is_active", "doctor_category", "category_description"
+]
+# Older payloads (and create_doctor) use these names
+BULK_DOCTOR_ALIASES = {"specialization": "doctor_category", "years_experience": "years_of_experience"}
+AVAILABILITY_STATUSES = ("Available", "On leave", "Busy", "Unavailable")
+BULK_DOCTOR_INT_FIELDS = ("years_of_experience", "is_active")
+
+
+def _parse_doctor_rows(doctors=None, csv_content=None):
+    """Accept a list (or JSON list) of dicts, or CSV text with a header row"""
+    if csv_content:
+        return list(csv.DictReader(io.StringIO(csv_content.lstrip("\ufeff"))))
+    if isinstance(doctors, str):
+        doctors = json.loads(doctors)
+    if not isinstance(doctors, list):
+        frappe.throw("Doctors must be a list of records or CSV content.")
+    return doctors
+
+
+def _resolve_links(doctype, label_field, values):
+    """Map link values given either as the row name or its label to the name, in one query"""
+    values = tuple({v for v in values if v})
+    if not values:
+        return {}
+    rows = frappe.db.sql(
+        f"SELECT name, {label_field} AS label FROM `tab{doctype}` WHERE name IN %(values)s OR {label_field} IN %(values)s",
+        {"values": values},
+        as_dict=True,
+    )
+    resolved = {}
+    for row in rows:
+        resolved[row.name] = row.name
+        if row.label:
+            resolved.setdefault(row.label, row.name)
+    return resolved
+
+
+def doctor_full_name(first_name, last_name):
+    """Same rule as Doctor.validate"""
+    if first_name and last_name:
+        return f"Dr.{first_name} {last_name}"
+    if first_name:
+        return f"Dr.{first_name}"
+    return "Dr.Unknown"
+
+
+def _clean_doctor_rows(records):
+    """Normalise and validate uploaded rows; returns (rows, errors) with 1-based row numbers"""
+    rows, errors, seen = [], [], set()
+    for i, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            errors.append({"row": i, "email": None, "error": "Each record must be an object"})
+            continue
+        row = {}
+        for key, value in (record or {}).items():
+            key = BULK_DOCTOR_ALIASES.get((key or "").strip(), (key or "").strip())
+            if key in BULK_DOCTOR_FIELDS and value not in (None, ""):
+                row[key] = value.strip() if isinstance(value, str) else value
+        email = (row.get("email") or "").lower()
+        row["email"] = email
+
+        error = None
+        if not email or not validate_email_address(email):
+            error = "A valid email is required"
+        elif email in seen:
+            error = f"Duplicate email {email} in upload"
+        elif not row.get("first_name"):
+            error = "First name is required"
+        elif row.get("availability_status") and row["availability_status"] not in AVAILABILITY_STATUSES:
+            error = f"Invalid availability status {row['availability_status']}"
+        else:
+            error = _coerce_doctor_fields(row)
+
+        if error:
+            errors.append({"row": i, "email": email, "error": error})
+            continue
+        seen.add(email)
+        row["_row"] = i
+        rows.append(row)
+    return rows, errors
+
+
+def _coerce_doctor_fields(row):
+    """Cast numeric and check fields in place, the same for inserts and updates; returns an error or None"""
+    for field in BULK_DOCTOR_INT_FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        if isinstance(value, str) and value.lower() in ("yes", "true"):
+            value = 1
+        elif isinstance(value, str) and value.lower() in ("no", "false"):
+            value = 0
+        try:
+            row[field] = int(float(value))
+        except (TypeError, ValueError):
+            return f"{field} must be a number, got {value!r}"
+    return None
+
+
+@frappe.whitelist(allow_guest=False)
+def bulk_upsert_doctors(doctors=None, csv_content=None, update_existing=1):
+    """
+    Create or update many doctors from a JSON list or CSV text, keyed by email.
+
+    Uploads above BULK_DOCTOR_ENQUEUE_THRESHOLD rows run as a background job;
+    progress and the final report arrive as `doctor_import_progress` realtime
+    events either way.
+    """
+    frappe.has_permission("Doctor", "create", throw=True)
+    if cint(update_existing):
+        # Matching emails overwrite existing Doctor rows
+        frappe.has_permission("Doctor", "write", throw=True)
+    records = _parse_doctor_rows(doctors, csv_content)
+
+    if len(records) > BULK_DOCTOR_ENQUEUE_THRESHOLD:
+        job = frappe.enqueue(
+            "myhealth.myhealth.api.doctor_api.upsert_doctor_records",
+            queue="long",
+            timeout=3600,
+            records=records,
+            update_existing=cint(update_existing),
+            user=frappe.session.user,
+        )
+        return {"queued": True, "job_id": getattr(job, "id", None), "total": len(records)}
+
+    return upsert_doctor_records(records, cint(update_existing), frappe.session.user)
+
+
+def upsert_doctor_records(records, update_existing=1, user=None):
+    """
+    Bulk upsert worker: one query for existing emails, one per link doctype, then
+    chunked inserts/updates each committed on its own. A failing chunk is retried
+    row by row so one bad record only fails itself.
+    """
+    user = user or frappe.session.user
+    rows, errors = _clean_doctor_rows(records)
+    total = len(records)
+
+    departments = _resolve_links("Department", "department_name", [r.get("department") for r in rows])
+    categories = _resolve_links("Doctor Category", "category_name", [r.get("doctor_category") for r in rows])
+    valid = []
+    for row in rows:
+        for field, resolved in (("department", departments), ("doctor_category", categories)):
+            if row.get(field):
+                if row[field] not in resolved:
+                    errors.append({"row": row["_row"], "email": row["email"], "error": f"Unknown {field} {row[field]}"})
+                    break
+                row[field] = resolved[row[field]]
+        else:
+            valid.append(row)
+
+    existing = {}
+    if valid:
+        for doc in frappe.get_all(
+            "Doctor",
+            filters={"email": ["in", [r["email"] for r in valid]]},
+            fields=["name", "email", "first_name", "last_name", "department", "doctor_category"],
+        ):
+            existing.setdefault((doc.email or "").lower(), doc)
+
+    inserts = [r for r in valid if r["email"] not in existing]
+    updates = [r for r in valid if r["email"] in existing] if update_existing else []
+    skipped = len(valid) - len(inserts) - len(updates)
+
+    created, updated, processed = [], [], 0
+
+    def publish():
+        frappe.publish_realtime(
+            "doctor_import_progress",
+            {"processed": processed, "total": total, "created": len(created), "updated": len(updated)},
+            user=user,
+        )
+
+    for chunk in chunked(inserts, BULK_DOCTOR_CHUNK_SIZE):
+        try:
+            docs = _doctor_insert_rows(chunk)
+            bulk_insert_rows("Doctor", docs)
+            frappe.db.commit()
+            created.extend(d["name"] for d in docs)
+        except Exception:
+            frappe.db.rollback()
+            for row in chunk:
+                try:
+                    docs = _doctor_insert_rows([row])
+                    bulk_insert_rows("Doctor", docs)
+                    frappe.db.commit()
+                    created.append(docs[0]["name"])
+                except Exception as e:
+                    frappe.db.rollback()
+                    errors.append({"row": row["_row"], "email": row["email"], "error": str(e)})
+        processed += len(chunk)
+        publish()
+
+    for chunk in chunked(updates, BULK_DOCTOR_CHUNK_SIZE):
+        changes = {existing[row["email"]].name: _doctor_update_fields(row, existing[row["email"]]) for row in chunk}
+        try:
+            frappe.db.bulk_update("Doctor", changes, chunk_size=BULK_DOCTOR_CHUNK_SIZE)
+            frappe.db.commit()
+            updated.extend(changes)
+        except Exception:
+            frappe.db.rollback()
+            for row in chunk:
+                name = existing[row["email"]].name
+                try:
+                    frappe.db.bulk_update("Doctor", {name: changes[name]})
+                    frappe.db.commit()
+                    updated.append(name)
+                except Exception as e:
+                    frappe.db.rollback()
+                    errors.append({"row": row["_row"], "email": row["email"], "error": str(e)})
+        processed += len(chunk)
+        publish()
+
+    # Bulk writes skip Doctor.on_update
+    clear_doctor_cache(created + updated)
+
+    report = {
+        "total": total,
+        "created": created,
+        "updated": updated,
+        "skipped": skipped,
+        "errors": sorted(errors, key=lambda e: e["row"]),
+    }
+    frappe.publish_realtime("doctor_import_progress", dict(report, done=True), user=user)
+    return report
+
+
+def _doctor_update_fields(row, current):
+    """Uploaded fields for an existing doctor plus the derived name and search columns"""
+    fields = {k: v for k, v in row.items() if k not in ("_row", "email")}
+    merged = frappe._dict(current, **fields)
+    fields["full_name"] = doctor_full_name(merged.first_name, merged.last_name)
+    fields["search_text"] = build_search_text(merged)
+    return fields
+
+
+def _doctor_insert_rows(rows):
+    """Build Doctor rows for bulk_insert_rows, naming them from the DOC- series"""
+    docs = []
+    for row, name in zip(rows, reserve_names("DOC-.###", len(rows)), strict=True):
+        doc = {k: v for k, v in row.items() if k != "_row"}
+        doc.update({
+            "name": name,
+            "full_name": doctor_full_name(doc.get("first_name"), doc.get("last_name")),
+            "availability_status": doc.get("availability_status") or "Available",
+            "years_of_experience": doc.get("years_of_experience", 0),
+            "is_active": doc.get("is_active", 0),
+        })
+        doc["search_text"] = build_search_text(frappe._dict(doc))
+        docs.append(doc)
+    return docs
+
+
 # ✅ Fetch a specific doctor
 @frappe.whitelist(allow_guest=False)
 def get_doctor(name):
@@ -44,33 +388,162 @@ def get_doctor(name):
     return {"doctor": doc.as_dict()}
 
 
+DOCTOR_SEARCH_INDEX = "doctor_search_text"
+DOCTOR_SEARCH_CACHE_PREFIX = "myhealth:doctor_search:"
+DOCTOR_SEARCH_TTL = 60
+DOCTOR_LIST_FIELDS = [
+    "name", "full_name", "first_name", "last_name", "email", "phone_number",
+    "department", "doctor_category", "availability_status", "years_of_experience", "is_active"
+]
+DOCTOR_FACETS = ("department", "doctor_category", "availability_status")
+
+
+def build_search_text(doc):
+    """Words the directory search matches on: name, department and category"""
+    return " ".join(filter(None, (doc.first_name, doc.last_name, doc.department, doc.doctor_category)))
+
+
+# InnoDB never indexes these, so a required `+token*` on one matches nothing
+FULLTEXT_MIN_TOKEN_SIZE = 3
+FULLTEXT_STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how",
+    "i", "in", "is", "it", "la", "of", "on", "or", "that", "the", "this", "to", "was", "what",
+    "when", "where", "who", "will", "with", "und", "www",
+))
+
+
+def _search_terms(search):
+    """
+    Split free text into a boolean-mode query requiring a prefix match per
+    indexable token, and the tokens full-text search cannot see (too short
+    for innodb_ft_min_token_size, or InnoDB stopwords).
+    """
+    terms, skipped = [], []
+    for token in re.findall(r"\w+", (search or "").lower()):
+        if len(token) < FULLTEXT_MIN_TOKEN_SIZE or token in FULLTEXT_STOPWORDS:
+            skipped.append(token)
+        else:
+            terms.append(f"+{token}*")
+    return " ".join(terms), skipped
+
+
+def _search_condition(search, values):
+    """
+    WHERE condition for the directory search. Indexable tokens go to the
+    full-text query; every other token must still prefix-match the first or
+    last name (both indexed), so "Li cardio" finds cardiologists named Li.
+    """
+    terms, skipped = _search_terms(search)
+    conditions = []
+    if terms:
+        values["terms"] = terms
+        conditions.append("MATCH(search_text) AGAINST (%(terms)s IN BOOLEAN MODE)")
+    for i, token in enumerate(dict.fromkeys(skipped)):
+        prefix = token.replace("_", "\\_")
+        values[f"name_prefix_{i}"] = f"{prefix}%"
+        conditions.append(f"(first_name LIKE %(name_prefix_{i})s OR last_name LIKE %(name_prefix_{i})s)")
+    return " AND ".join(conditions)
+
+
+def _encode_doctor_cursor(row):
+    payload = json.dumps([row.full_name or "", row.name])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_doctor_cursor(cursor):
+    try:
+        full_name, name = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return full_name, name
+    except Exception:
+        frappe.throw("Invalid doctor cursor.")
+
+
 # ✅ List or search doctors
 @frappe.whitelist(allow_guest=False)
-def list_doctors(search=None, specialization=None, department=None, availability_status=None):
-    """List all doctors, with optional filters"""
-    filters = {}
-
-    if search:
-        filters["full_name"] = ["like", f"%{search}%"]
-    if specialization:
-        filters["specialization"] = specialization
-    if department:
-        filters["department"] = department
-    if availability_status:
-        filters["availability_status"] = availability_status
-
-    doctors = frappe.get_all(
-        "Doctor",
-        filters=filters,
-        fields=[
-            "name", "full_name", "specialization", "department",
-            "email", "phone_number", "availability_status",
-            "years_experience", "appointments_completed", "average_rating"
-        ],
-        order_by="full_name asc"
+def list_doctors(search=None, specialization=None, department=None, availability_status=None,
+                 doctor_category=None, cursor=None, page_length=20):
+    """
+    Doctor directory: token-prefix search on name, department and category,
+    paged by full name, with facet counts for department, category and
+    availability. Each doctor carries its Doctor Stats counts.
+    `specialization` is accepted as an alias of doctor_category.
+
+    Results are cached for a minute per query; Doctor changes clear them.
+    """
+    page_length = min(cint(page_length) or 20, 100)
+    filters = {
+        "department": department,
+        "doctor_category": doctor_category or specialization,
+        "availability_status": availability_status,
+    }
+    cache_key = DOCTOR_SEARCH_CACHE_PREFIX + frappe.generate_hash(
+        json.dumps([search, filters, cursor, page_length], sort_keys=True), length=20
+    )
+    cached = frappe.cache.get_value(cache_key)
+    if cached is not None:
+        return cached
+
+    values = {}
+    search_condition = _search_condition(search, values)
+    match = f"WHERE {search_condition}" if search_condition else ""
+
+    # One grouped query gives every facet; each facet ignores its own filter
+    groups = frappe.db.sql(
+        f"""
+        SELECT department, doctor_category, availability_status, COUNT(*) AS count
+        FROM `tabDoctor` {match}
+        GROUP BY department, doctor_category, availability_status
+        """,
+        values,
+        as_dict=True,
     )
+    facets = {facet: {} for facet in DOCTOR_FACETS}
+    total = 0
+    for group in groups:
+        for facet in DOCTOR_FACETS:
+            if all(not filters[f] or group[f] == filters[f] for f in DOCTOR_FACETS if f != facet):
+                key = group[facet] or "Not Set"
+                facets[facet][key] = facets[facet].get(key, 0) + group.count
+        if all(not filters[f] or group[f] == filters[f] for f in DOCTOR_FACETS):
+            total += group.count
+
+    conditions = [search_condition] if search_condition else []
+    for facet in DOCTOR_FACETS:
+        if filters[facet]:
+            conditions.append(f"{facet} = %({facet})s")
+            values[facet] = filters[facet]
+    if cursor:
+        values["c_full_name"], values["c_name"] = _decode_doctor_cursor(cursor)
+        conditions.append(
+            "(IFNULL(full_name, '') > %(c_full_name)s"
+            " OR (IFNULL(full_name, '') = %(c_full_name)s AND name > %(c_name)s))"
+        )
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    values["limit"] = page_length + 1
+    doctors = frappe.db.sql(
+        f"""
+        SELECT {', '.join(DOCTOR_LIST_FIELDS)}
+        FROM `tabDoctor` {where}
+        ORDER BY IFNULL(full_name, '') ASC, name ASC
+        LIMIT %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    next_cursor = None
+    if len(doctors) > page_length:
+        doctors = doctors[:page_length]
+        next_cursor = _encode_doctor_cursor(doctors[-1])
 
-    return {"doctors": doctors}
+    stats = get_doctor_stats_map([d.name for d in doctors])
+    for doctor in doctors:
+        doctor["stats"] = stats[doctor.name]
+
+    result = {"doctors": doctors, "facets": facets, "total": total, "next_cursor": next_cursor}
+    frappe.cache.set_value(cache_key, result, expires_in_sec=DOCTOR_SEARCH_TTL)
+    return result
 
 
 # ✅ Update a doctor
@@ -144,93 +617,317 @@ def delete_doctor(name):
 
     return {"message": "Doctor deleted successfully"}
 
+MAX_SCHEDULE_DAYS = 92
+
+
 @frappe.whitelist()
-def get_doctor_schedule(doctor):
+def get_doctor_schedule(doctor=None, doctors=None, start=None, end=None):
     """
-    Return combined schedule for a doctor: appointments + leaves.
+    Return combined schedule for one or many doctors: appointments, leaves and
+    availability blocks inside a date window.
     Output is used by the frontend calendar.
     """
+    if isinstance(doctors, str):
+        doctors = json.loads(doctors)
+    doctors = list(dict.fromkeys((doctors or []) + ([doctor] if doctor else [])))
+    if not doctors:
+        frappe.throw("Please select at least one doctor.")
+
+    start = getdate(start or nowdate())
+    end = getdate(end or add_days(start, 31))
+    if end < start:
+        frappe.throw("End date cannot be before start date.")
+    if date_diff(end, start) > MAX_SCHEDULE_DAYS:
+        frappe.throw(f"Schedules can be requested for at most {MAX_SCHEDULE_DAYS} days at a time.")
+
+    window = {"doctors": tuple(doctors), "start": start, "end": end}
+
+    appointments = frappe.db.sql(
+        """
+        SELECT name, doctor, patient, appointment_date, start_time, end_time, status, service_status
+        FROM `tabAppointment`
+        WHERE doctor IN %(doctors)s AND appointment_date BETWEEN %(start)s AND %(end)s
+        ORDER BY appointment_date, start_time
+        """,
+        window,
+        as_dict=True,
+    )
+    leaves = frappe.db.sql(
+        """
+        SELECT name, doctor, leave_type, leave_start, leave_end, status
+        FROM `tabDoctor Leave`
+        WHERE doctor IN %(doctors)s
+            AND status IN ('Pending', 'Approved')
+            AND leave_start <= %(end)s AND leave_end >= %(start)s
+        """,
+        window,
+        as_dict=True,
+    )
+    availability = frappe.db.sql(
+        """
+        SELECT name, doctor, date, start_time, end_time, slot_duration
+        FROM `tabDoctor Availability`
+        WHERE doctor IN %(doctors)s
+            AND date BETWEEN %(start)s AND %(end)s
+            AND IFNULL(status, 'Active') != 'Disabled'
+        """,
+        window,
+        as_dict=True,
+    )
 
     events = []
 
     # --- 🩺 1. Appointments ---
-    appointments = frappe.get_all(
-        "Appointment",
-        filters={"doctor": doctor},
-        fields=[
-            "name",
-            "patient",
-            "appointment_date",
-            "appointment_time",
-            "status"
-        ]
-    )
-
     for a in appointments:
-        if not a.appointment_date or not a.appointment_time:
+        if not a.start_time:
             continue
 
-        start_time = f"{a.appointment_date}T{a.appointment_time}"
-
+        status = a.status or a.service_status
         color = "#2196F3"  # Blue default
-        if a.status == "Completed":
+        if status == "Completed":
             color = "#4CAF50"
-        elif a.status == "Cancelled":
+        elif status == "Cancelled":
             color = "#F44336"
-        elif a.status == "Pending":
+        elif status == "Pending":
             color = "#FFC107"
 
         events.append({
+            "doctor": a.doctor,
+            "type": "appointment",
             "title": f"Appointment - {a.patient}",
-            "start": start_time,
-            "end": start_time,
+            "start": f"{a.appointment_date}T{a.start_time}",
+            "end": f"{a.appointment_date}T{a.end_time or a.start_time}",
             "color": color,
             "url": f"/app/appointment/{a.name}"
         })
 
     # --- 🏖️ 2. Doctor Leaves ---
-    leaves = frappe.get_all(
-        "Doctor Leave",
-        filters={"doctor": doctor, "status": ["in", ["Pending", "Approved"]]},
-        fields=["name", "leave_type", "leave_start", "leave_end", "status"]
-    )
-
     for l in leaves:
-        if not l.leave_start or not l.leave_end:
-            continue
-
-        # +1 day to include the end date fully
-        end_date = (
-            datetime.datetime.strptime(str(l.leave_end), "%Y-%m-%d")
-            + datetime.timedelta(days=1)
-        ).strftime("%Y-%m-%d")
-
         color = "#F44336" if l.status == "Approved" else "#FFB300"
 
         events.append({
-            "title": f"{l.leave_type} Leave",
+            "doctor": l.doctor,
+            "type": "leave",
+            "title": f"{l.leave_type or 'Doctor'} Leave",
             "start": str(l.leave_start),
-            "end": end_date,
+            # +1 day to include the end date fully
+            "end": str(add_days(l.leave_end, 1)),
             "color": color,
             "display": "background",  # ✅ renders as shaded blocks
         })
 
+    # --- ✅ 3. Availability ---
+    for av in availability:
+        events.append({
+            "doctor": av.doctor,
+            "type": "availability",
+            "title": "Available",
+            "start": f"{av.date}T{av.start_time}",
+            "end": f"{av.date}T{av.end_time}",
+            "color": "#81C784",
+            "display": "background",
+        })
+
     return events
 
-@frappe.whitelist(allow_guest=False)
-def get_doctor_stats(doctor):
-    total_appointments = frappe.db.count("Appointment", {"doctor_name": doctor})
-    upcoming = frappe.db.count("Appointment", {"doctor_name": doctor, "service_status": "Pending"})
-    active_leaves = frappe.db.count("Doctor Leave", {"doctor": doctor, "status": "Approved"})
-    patients_seen = frappe.db.count("Appointment", {"doctor_name": doctor, "service_status": "Completed"})
+DOCTOR_STATS_FIELDS = [
+    "total_appointments", "upcoming_appointments", "completed_appointments",
+    "cancelled_appointments", "active_leaves", "unique_patients"
+]
+DOCTOR_STATS_CHUNK_SIZE = 500
+
+
+def _compute_doctor_stats(doctors=None):
+    """Aggregate stats for some doctors (or all) with one query per source table"""
+    values = {"today": nowdate()}
+    doctor_filter = ""
+    if doctors is not None:
+        values["doctors"] = tuple(doctors)
+        doctor_filter = "AND doctor IN %(doctors)s"
+
+    appointments = frappe.db.sql(
+        f"""
+        SELECT doctor,
+            COUNT(*) AS total_appointments,
+            SUM(is_cancelled = 0 AND is_completed = 0 AND is_displaced = 0
+                AND appointment_date >= %(today)s) AS upcoming_appointments,
+            SUM(is_completed = 1 AND is_cancelled = 0) AS completed_appointments,
+            SUM(is_cancelled) AS cancelled_appointments,
+            COUNT(DISTINCT patient) AS unique_patients
+        FROM (
+            SELECT doctor, patient, appointment_date,
+                'Cancelled' IN (IFNULL(status, ''), IFNULL(service_status, '')) AS is_cancelled,
+                'Completed' IN (IFNULL(status, ''), IFNULL(service_status, '')) AS is_completed,
+                IFNULL(displaced_by_leave, '') != '' AS is_displaced
+            FROM `tabAppointment`
+            WHERE doctor IS NOT NULL {doctor_filter}
+        ) a
+        GROUP BY doctor
+        """,
+        values,
+        as_dict=True,
+    )
+    leaves = frappe.db.sql(
+        f"""
+        SELECT doctor, COUNT(*) AS active_leaves
+        FROM `tabDoctor Leave`
+        WHERE status = 'Approved' AND leave_end >= %(today)s {doctor_filter}
+        GROUP BY doctor
+        """,
+        values,
+        as_dict=True,
+    )
+
+    stats = {d: dict.fromkeys(DOCTOR_STATS_FIELDS, 0) for d in (doctors or [])}
+    for row in appointments:
+        stats.setdefault(row.doctor, dict.fromkeys(DOCTOR_STATS_FIELDS, 0)).update(
+            {field: cint(row[field]) for field in DOCTOR_STATS_FIELDS if field in row}
+        )
+    for row in leaves:
+        stats.setdefault(row.doctor, dict.fromkeys(DOCTOR_STATS_FIELDS, 0))["active_leaves"] = cint(row.active_leaves)
+    return stats
+
+
+def _write_doctor_stats(stats, doctors=None):
+    if doctors is None:
+        frappe.db.delete("Doctor Stats")
+    else:
+        frappe.db.delete("Doctor Stats", {"name": ["in", list(doctors)]})
+
+    # Only doctors that still exist get a row, so deleted doctors drop out
+    existing = set(frappe.get_all("Doctor", filters={"name": ["in", list(stats)]}, pluck="name")) if stats else set()
+    rows = [dict(counts, name=doctor, doctor=doctor) for doctor, counts in stats.items() if doctor in existing]
+    for chunk in chunked(rows, DOCTOR_STATS_CHUNK_SIZE):
+        bulk_insert_rows("Doctor Stats", chunk)
 
+
+def refresh_doctor_stats(doctors):
+    """
+    Recount the Doctor Stats rows of the given doctors from scratch.
+
+    Hooks and bulk writers keep the rows current with adjust_doctor_stats; this
+    is the repair path for a handful of doctors whose rows have drifted.
+    """
+    doctors = {d for d in ([doctors] if isinstance(doctors, str) else doctors or []) if d}
+    if not doctors:
+        return
+    _write_doctor_stats(_compute_doctor_stats(doctors), doctors)
+
+
+def adjust_doctor_stats(doctor, deltas):
+    """Atomically add per-field deltas to a doctor's stats row, creating it on first use"""
+    deltas = {field: cint(delta) for field, delta in deltas.items() if field in DOCTOR_STATS_FIELDS and cint(delta)}
+    if not doctor or not deltas:
+        return
+    columns = ", ".join(deltas)
+    inserts = ", ".join(f"GREATEST(%({field})s, 0)" for field in deltas)
+    updates = ", ".join(f"{field} = GREATEST({field} + %({field})s, 0)" for field in deltas)
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabDoctor Stats`
+            (name, doctor, {columns}, creation, modified, owner, modified_by)
+        VALUES (%(doctor)s, %(doctor)s, {inserts}, %(now)s, %(now)s, 'Administrator', 'Administrator')
+        ON DUPLICATE KEY UPDATE {updates}, modified = %(now)s
+        """,
+        dict(deltas, doctor=doctor, now=now()),
+    )
+
+
+def _appointment_stats(doc):
+    """What one appointment contributes to its doctor's counters"""
+    if not doc or not doc.doctor:
+        return {}
+    cancelled = "Cancelled" in (doc.status, doc.service_status)
+    completed = not cancelled and "Completed" in (doc.status, doc.service_status)
+    upcoming = (
+        not cancelled and not completed and not doc.displaced_by_leave
+        and bool(doc.appointment_date) and getdate(doc.appointment_date) >= getdate(nowdate())
+    )
     return {
-        "total_appointments": total_appointments,
-        "upcoming": upcoming,
-        "active_leaves": active_leaves,
-        "patients_seen": patients_seen
+        "total_appointments": 1,
+        "upcoming_appointments": int(upcoming),
+        "completed_appointments": int(completed),
+        "cancelled_appointments": int(cancelled),
     }
 
+
+def _has_other_appointment(doctor, patient, exclude):
+    return bool(frappe.db.exists(
+        "Appointment", {"doctor": doctor, "patient": patient, "name": ["not in", [n for n in exclude if n]]}
+    ))
+
+
+def update_appointment_stats(previous, current):
+    """
+    Apply the ±1 changes of one appointment save (previous=None) or delete
+    (current=None). Unique patients change only when no other appointment links
+    the same doctor and patient, checked with one indexed lookup.
+    """
+    old, new = _appointment_stats(previous), _appointment_stats(current)
+    old_doctor = previous.doctor if previous else None
+    new_doctor = current.doctor if current else None
+
+    if old_doctor == new_doctor:
+        adjust_doctor_stats(new_doctor, {f: new.get(f, 0) - old.get(f, 0) for f in set(old) | set(new)})
+    else:
+        adjust_doctor_stats(old_doctor, {f: -v for f, v in old.items()})
+        adjust_doctor_stats(new_doctor, new)
+
+    old_pair = (old_doctor, previous.patient) if previous else (None, None)
+    new_pair = (new_doctor, current.patient) if current else (None, None)
+    if old_pair == new_pair:
+        return
+    exclude = [previous.name if previous else None, current.name if current else None]
+    if all(new_pair) and not _has_other_appointment(*new_pair, exclude):
+        adjust_doctor_stats(new_doctor, {"unique_patients": 1})
+    if all(old_pair) and not _has_other_appointment(*old_pair, exclude):
+        adjust_doctor_stats(old_doctor, {"unique_patients": -1})
+
+
+def _leave_is_active(doc):
+    return bool(
+        doc and doc.doctor and doc.status == "Approved"
+        and doc.leave_end and getdate(doc.leave_end) >= getdate(nowdate())
+    )
+
+
+def update_leave_stats(previous, current):
+    """Apply the ±1 change of one Doctor Leave save (previous=None) or delete (current=None)"""
+    if _leave_is_active(previous):
+        adjust_doctor_stats(previous.doctor, {"active_leaves": -1})
+    if _leave_is_active(current):
+        adjust_doctor_stats(current.doctor, {"active_leaves": 1})
+
+
+def rebuild_doctor_stats():
+    """
+    Recompute every Doctor Stats row. Runs daily, because upcoming appointments
+    and active leaves roll over with the date rather than with a save.
+    """
+    _write_doctor_stats(_compute_doctor_stats())
+    frappe.db.commit()
+
+
+def get_doctor_stats_map(doctors):
+    """Stats for many doctors with a single primary-key read; missing rows are zeros"""
+    doctors = [d for d in doctors if d]
+    rows = frappe.get_all(
+        "Doctor Stats",
+        filters={"name": ["in", doctors]},
+        fields=["name", *DOCTOR_STATS_FIELDS],
+    ) if doctors else []
+    stats = {d: dict.fromkeys(DOCTOR_STATS_FIELDS, 0) for d in doctors}
+    for row in rows:
+        stats[row.name] = {field: row[field] for field in DOCTOR_STATS_FIELDS}
+    return stats
+
+
+@frappe.whitelist(allow_guest=False)
+def get_doctor_stats(doctor):
+    """Read a doctor's precomputed stats; `upcoming`/`patients_seen` keep the old keys"""
+    stats = get_doctor_stats_map([doctor])[doctor]
+    return dict(stats, upcoming=stats["upcoming_appointments"], patients_seen=stats["completed_appointments"])
+
 @frappe.whitelist(allow_guest=True)
 def get_doctor(name):
     doctor = frappe.get_doc("Doctor", name)
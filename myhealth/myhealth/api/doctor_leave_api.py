@@ -1,5 +1,14 @@
+import time
+
 import frappe
 from datetime import datetime
+from frappe.utils import add_days, getdate, now, nowdate
+
+from myhealth.myhealth.api.availability_api import clear_slot_cache
+from myhealth.myhealth.api.doctor_api import adjust_doctor_stats, clear_doctor_cache
+from myhealth.myhealth.api.leave_index import get_leave_overlap, invalidate_leave_index
+from myhealth.myhealth.api.waitlist_api import PRIORITY_RANK
+from myhealth.myhealth.utils import bulk_insert_rows, chunked, reserve_names
 
 @frappe.whitelist(allow_guest=False)
 def apply_leave(doctor, leave_start, leave_end, leave_reason=None):
@@ -8,18 +17,7 @@ def apply_leave(doctor, leave_start, leave_end, leave_reason=None):
         frappe.throw("Doctor not found")
 
     # Check if doctor already has overlapping approved leave
-    existing = frappe.get_all(
-        "Doctor Leave",
-        filters={
-            "doctor": doctor,
-            "status": "Approved",
-            "leave_end": (">=", leave_start),
-            "leave_start": ("<=", leave_end),
-        },
-        fields=["name"]
-    )
-
-    if existing:
+    if get_leave_overlap(doctor, leave_start, leave_end):
         frappe.throw("Doctor already has approved leave during this period.")
 
     leave_doc = frappe.get_doc({
@@ -40,8 +38,14 @@ def apply_leave(doctor, leave_start, leave_end, leave_reason=None):
 
 
 @frappe.whitelist(allow_guest=False)
-def approve_leave(leave_id, approved_by=None):
-    """Approve a doctor leave and update doctor's status"""
+def approve_leave(leave_id, approved_by=None, reschedule_as="Rescheduled"):
+    """
+    Approve a doctor leave, update doctor's status and release the appointments
+    booked inside the leave window.
+    """
+    if reschedule_as not in DISPLACED_STATUSES:
+        frappe.throw(f"Displaced appointments can only be marked {' or '.join(DISPLACED_STATUSES)}.")
+
     doc = frappe.get_doc("Doctor Leave", leave_id)
     if doc.status == "Approved":
         frappe.throw("This leave is already approved.")
@@ -55,8 +59,155 @@ def approve_leave(leave_id, approved_by=None):
     doctor.availability_status = "Unavailable"
     doctor.save(ignore_permissions=True)
 
+    displaced = release_leave_appointments(doc, reschedule_as)
+
+    frappe.db.commit()
+    return {
+        "message": f"Leave approved for {doctor.full_name} from {doc.leave_start} to {doc.leave_end}",
+        "appointments_released": len(displaced),
+    }
+
+
+DISPLACED_STATUSES = ("Rescheduled", "Pending")
+
+
+def release_leave_appointments(leave, status="Rescheduled"):
+    """
+    Mark every open appointment inside an approved leave with `status`, using one
+    range query and chunked bulk updates, then queue the patient follow-up.
+    """
+    # Lock only the Appointment rows; patient emails are read separately
+    displaced = frappe.db.sql(
+        """
+        SELECT name, patient, appointment_date, start_time
+        FROM `tabAppointment`
+        WHERE doctor = %(doctor)s
+            AND appointment_date BETWEEN %(leave_start)s AND %(leave_end)s
+            AND IFNULL(status, '') NOT IN ('Cancelled', 'Completed')
+            AND IFNULL(service_status, '') NOT IN ('Cancelled', 'Completed')
+            AND IFNULL(displaced_by_leave, '') = ''
+        FOR UPDATE
+        """,
+        {"doctor": leave.doctor, "leave_start": leave.leave_start, "leave_end": leave.leave_end},
+        as_dict=True,
+    )
+    if not displaced:
+        return []
+
+    emails = dict(frappe.get_all(
+        "Patient",
+        filters={"name": ["in", list({a.patient for a in displaced if a.patient})]},
+        fields=["name", "email"],
+        as_list=True,
+    ))
+    for appt in displaced:
+        appt.patient_email = emails.get(appt.patient)
+
+    # displaced_by_leave takes the rows out of reminders, slot conflicts and
+    # upcoming stats until the booking is moved
+    for chunk in chunked([a.name for a in displaced], LEAVE_CHUNK_SIZE):
+        frappe.db.sql(
+            """
+            UPDATE `tabAppointment`
+            SET status = %(status)s, displaced_by_leave = %(leave)s, reminder_sent = 1,
+                modified = %(now)s, modified_by = %(user)s
+            WHERE name IN %(names)s
+            """,
+            {
+                "names": tuple(chunk),
+                "status": status,
+                "leave": leave.name,
+                "now": now(),
+                "user": frappe.session.user,
+            },
+        )
+
+    # Bulk updates skip Appointment.on_update, so drop the cached days and
+    # take the released bookings out of the upcoming count here
+    clear_slot_cache(leave.doctor, {a.appointment_date for a in displaced})
+    today = getdate(nowdate())
+    released = sum(1 for a in displaced if getdate(a.appointment_date) >= today)
+    adjust_doctor_stats(leave.doctor, {"upcoming_appointments": -released})
+
+    frappe.enqueue(
+        "myhealth.myhealth.api.doctor_leave_api.follow_up_displaced_appointments",
+        queue="long",
+        enqueue_after_commit=True,
+        job_id=f"leave_displaced::{leave.name}",
+        deduplicate=True,
+        leave_id=leave.name,
+        appointments=[
+            {
+                "name": a.name,
+                "patient": a.patient,
+                "email": a.patient_email,
+                "date": str(a.appointment_date),
+                "start_time": str(a.start_time) if a.start_time else None,
+            }
+            for a in displaced
+        ],
+    )
+    return displaced
+
+
+def follow_up_displaced_appointments(leave_id, appointments):
+    """
+    Background job after a leave approval.
+
+    The doctor has no slots during the leave, so instead of offering those
+    times, each displaced patient is queued on the waitlist at High priority for
+    the first day back (the daily sweep offers them the next free slot) and told
+    their appointment has to move.
+    """
+    leave = frappe.db.get_value("Doctor Leave", leave_id, ["doctor", "leave_end"], as_dict=True)
+    if not leave or not appointments:
+        return
+
+    first_day_back = add_days(getdate(leave.leave_end), 1)
+    already_waiting = set(frappe.get_all(
+        "Waitlist",
+        filters={"preferred_doctor": leave.doctor, "status": "Waiting", "patient": ["in", [a["patient"] for a in appointments]]},
+        pluck="patient",
+    ))
+
+    patients = []
+    for appt in appointments:
+        if appt["patient"] and appt["patient"] not in already_waiting and appt["patient"] not in patients:
+            patients.append(appt["patient"])
+
+    emails = {a["patient"]: a["email"] for a in appointments}
+    entries = [
+        {
+            "name": name,
+            "patient": patient,
+            "preferred_doctor": leave.doctor,
+            "preferred_date": first_day_back,
+            "contact_email": emails.get(patient),
+            "notes": f"Displaced by Doctor Leave {leave_id}",
+            "priority": "High",
+            "priority_rank": PRIORITY_RANK["High"],
+            "status": "Waiting",
+        }
+        for name, patient in zip(reserve_names("WL-.###", len(patients)), patients, strict=True)
+    ] if patients else []
+    bulk_insert_rows("Waitlist", entries)
+    frappe.db.commit()
+
+    for appt in appointments:
+        if not appt["email"]:
+            continue
+        at = f" at {appt['start_time']}" if appt["start_time"] else ""
+        frappe.sendmail(
+            recipients=appt["email"],
+            subject=f"Your Appointment on {appt['date']} Needs to Be Rescheduled",
+            message=(
+                f"Hi, Dr. {leave.doctor} is unavailable on {appt['date']}{at}. "
+                "You have been placed on the waitlist and we will offer you the next free slot."
+            ),
+            reference_doctype="Appointment",
+            reference_name=appt["name"],
+        )
     frappe.db.commit()
-    return {"message": f"Leave approved for {doctor.full_name} from {doc.leave_start} to {doc.leave_end}"}
 
 
 @frappe.whitelist(allow_guest=False)
@@ -76,15 +227,72 @@ def end_leave(leave_id):
     frappe.db.commit()
     return {"message": f"{doctor.full_name}'s leave has ended and status is now available."}
 
+LEAVE_CHUNK_SIZE = 500
+
+
 def auto_end_expired_leaves():
-    today = datetime.now().date()
-    expired_leaves = frappe.get_all("Doctor Leave", filters={
-        "status": "Approved",
-        "leave_end": ("<", today)
-    })
+    """
+    Close every expired approved leave with bulk updates.
+
+    Each affected doctor is re-checked once and only marked Available when no
+    other approved leave still covers today. Returns what was touched.
+    """
+    started = time.monotonic()
+    today = getdate(nowdate())
+    expired = frappe.get_all(
+        "Doctor Leave",
+        filters={"status": "Approved", "leave_end": ("<", today)},
+        fields=["name", "doctor"],
+    )
+
+    for chunk in chunked([l.name for l in expired], LEAVE_CHUNK_SIZE):
+        frappe.db.sql(
+            """
+            UPDATE `tabDoctor Leave`
+            SET status = 'Completed', modified = %(now)s, modified_by = %(user)s
+            WHERE name IN %(names)s AND status = 'Approved'
+            """,
+            {"names": tuple(chunk), "now": now(), "user": frappe.session.user},
+        )
+        frappe.db.commit()
 
-    for leave in expired_leaves:
-        end_leave(leave.name)
+    if expired:
+        invalidate_leave_index()
+
+    doctors = {l.doctor for l in expired if l.doctor}
+    still_on_leave = set()
+    if doctors:
+        still_on_leave = set(frappe.get_all(
+            "Doctor Leave",
+            filters={
+                "doctor": ["in", list(doctors)],
+                "status": "Approved",
+                "leave_start": ("<=", today),
+                "leave_end": (">=", today),
+            },
+            pluck="doctor",
+        ))
+
+    available = sorted(doctors - still_on_leave)
+    for chunk in chunked(available, LEAVE_CHUNK_SIZE):
+        frappe.db.sql(
+            """
+            UPDATE `tabDoctor`
+            SET availability_status = 'Available', modified = %(now)s, modified_by = %(user)s
+            WHERE name IN %(names)s AND availability_status IN ('Unavailable', 'On leave')
+            """,
+            {"names": tuple(chunk), "now": now(), "user": frappe.session.user},
+        )
+        frappe.db.commit()
+    clear_doctor_cache(available)
+
+    result = {
+        "leaves_closed": len(expired),
+        "doctors_updated": len(available),
+        "duration_seconds": round(time.monotonic() - started, 3),
+    }
+    frappe.logger("myhealth").info(f"auto_end_expired_leaves: {result}")
+    return result
 
 @frappe.whitelist()
 def get_doctor_leaves(doctor):
@@ -0,0 +1,182 @@
+import re
+
+import frappe
+from frappe.utils import cint
+
+from myhealth.myhealth.utils import bulk_insert_rows
+
+NUMERIC_VALUE = re.compile(r"^\s*(-?(?:\d+(?:\.\d*)?|\.\d+))")
+# Censored results ("<5", ">= 100", "~3") are not exact values
+INEQUALITY_PREFIX = re.compile(r"^\s*[<>≤≥~]")
+THOUSANDS_COMMA = re.compile(r",(?=\d{3}(?!\d))")
+BACKFILL_CHUNK_SIZE = 500
+DEFAULT_TREND_POINTS = 500
+
+
+def normalise_parameter(parameter):
+    """Parameter names are matched case- and whitespace-insensitively"""
+    return " ".join((parameter or "").split()).lower()
+
+
+def parse_numeric(value):
+    """
+    Leading number of a free-text lab value, or None.
+
+    A comma followed by exactly three digits is a thousands separator
+    ("250,000", "1,234.5"); any other comma is a decimal mark ("7,2 %").
+    Censored values such as "<5" are skipped rather than charted as exact.
+    """
+    value = value or ""
+    if INEQUALITY_PREFIX.match(value):
+        return None
+    match = NUMERIC_VALUE.match(THOUSANDS_COMMA.sub("", value).replace(",", "."))
+    return float(match.group(1)) if match else None
+
+
+def refresh_lab_readings(record_names):
+    """
+    Rebuild the numeric readings derived from the given Medical Records.
+
+    Records and their detail rows are read with one query each and the readings
+    replaced with one delete and one bulk insert.
+    """
+    record_names = list(record_names)
+    if not record_names:
+        return 0
+
+    frappe.db.delete("Lab Parameter Reading", {"medical_record": ["in", record_names]})
+
+    records = {
+        r.name: r
+        for r in frappe.get_all(
+            "Medical Record",
+            filters={"name": ["in", record_names]},
+            fields=["name", "patient", "doctor", "record_date", "confidential"],
+        )
+    }
+    details = frappe.get_all(
+        "Medical Record Detail",
+        filters={"parent": ["in", record_names], "parenttype": "Medical Record"},
+        fields=["parent", "parameter", "value", "unit"],
+    )
+
+    readings = []
+    for row in details:
+        record = records.get(row.parent)
+        value = parse_numeric(row.value)
+        if not record or not record.patient or not record.record_date or value is None or not row.parameter:
+            continue
+        readings.append({
+            "name": frappe.generate_hash(length=10),
+            "patient": record.patient,
+            "parameter": normalise_parameter(row.parameter),
+            "record_date": record.record_date,
+            "numeric_value": value,
+            "unit": row.unit,
+            "medical_record": record.name,
+            "doctor": record.doctor,
+            "confidential": cint(record.confidential),
+        })
+
+    bulk_insert_rows("Lab Parameter Reading", readings)
+    return len(readings)
+
+
+def backfill_lab_readings(chunk_size=BACKFILL_CHUNK_SIZE):
+    """Derive readings for every Medical Record, committing per chunk"""
+    total = 0
+    last_name = ""
+    while True:
+        names = frappe.get_all(
+            "Medical Record",
+            filters={"name": [">", last_name]},
+            pluck="name",
+            order_by="name asc",
+            limit=chunk_size,
+        )
+        if not names:
+            break
+        total += refresh_lab_readings(names)
+        frappe.db.commit()
+        last_name = names[-1]
+    return total
+
+
+@frappe.whitelist(allow_guest=False)
+def rebuild_lab_readings():
+    """Queue a full backfill of the lab parameter time series"""
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "myhealth.myhealth.api.lab_trends_api.backfill_lab_readings",
+        queue="long",
+        job_id="backfill_lab_readings",
+        deduplicate=True,
+    )
+    return {"message": "Lab readings rebuild queued"}
+
+
+def _downsample(dates, values, max_points):
+    """Average fixed-size buckets so at most `max_points` points are returned"""
+    size = -(-len(values) // max_points)
+    out = {"dates": [], "values": [], "min": [], "max": []}
+    for i in range(0, len(values), size):
+        bucket = values[i:i + size]
+        out["dates"].append(dates[i])
+        out["values"].append(round(sum(bucket) / len(bucket), 4))
+        out["min"].append(min(bucket))
+        out["max"].append(max(bucket))
+    return out
+
+
+@frappe.whitelist(allow_guest=False)
+def get_parameter_trend(patient, parameter, from_date=None, to_date=None, max_points=DEFAULT_TREND_POINTS):
+    """
+    Columnar time series of one lab parameter for a patient.
+
+    Returns parallel `dates`/`values` arrays (plus per-point `min`/`max` when
+    downsampled) ready to feed a chart or a NumPy array.
+    """
+    # Confidential readings are filtered in SQL below, like the record lists
+    from myhealth.myhealth.api.medical_records_api import get_lab_reading_query_conditions
+
+    frappe.has_permission("Medical Record", "read", throw=True)
+
+    conditions = ["patient = %(patient)s", "parameter = %(parameter)s"]
+    values = {"patient": patient, "parameter": normalise_parameter(parameter)}
+    if from_date:
+        conditions.append("record_date >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("record_date <= %(to_date)s")
+        values["to_date"] = to_date
+    confidential = get_lab_reading_query_conditions()
+    if confidential:
+        conditions.append(confidential)
+
+    rows = frappe.db.sql(
+        f"""
+        SELECT record_date, numeric_value, unit
+        FROM `tabLab Parameter Reading`
+        WHERE {' AND '.join(conditions)}
+        ORDER BY record_date ASC
+        """,
+        values,
+    )
+
+    dates = [str(r[0]) for r in rows]
+    points = [r[1] for r in rows]
+    max_points = max(cint(max_points) or DEFAULT_TREND_POINTS, 2)
+
+    series = {"dates": dates, "values": points}
+    if len(points) > max_points:
+        series = _downsample(dates, points, max_points)
+
+    units = {r[2] for r in rows if r[2]}
+    return dict(
+        series,
+        patient=patient,
+        parameter=values["parameter"],
+        unit=units.pop() if len(units) == 1 else None,
+        count=len(points),
+        downsampled=len(points) > max_points,
+    )
@@ -0,0 +1,126 @@
+import bisect
+from datetime import date
+
+import frappe
+from frappe.utils import getdate
+
+LEAVE_INDEX_VERSION_KEY = "myhealth:leave_index_version"
+
+# site -> LeaveIndex, kept for the life of the worker process
+_indexes = {}
+
+
+def bump_leave_index_version():
+    """Invalidate every worker's leave index; call after approved leaves change"""
+    frappe.cache.set_value(LEAVE_INDEX_VERSION_KEY, frappe.generate_hash(length=10))
+
+
+def invalidate_leave_index():
+    """
+    Bump the version now, so this transaction re-reads its own writes, and again
+    after commit, so other workers never rebuild from the pre-commit state.
+    """
+    bump_leave_index_version()
+    frappe.db.after_commit.add(bump_leave_index_version)
+
+
+def _current_version():
+    version = frappe.cache.get_value(LEAVE_INDEX_VERSION_KEY)
+    if not version:
+        bump_leave_index_version()
+        version = frappe.cache.get_value(LEAVE_INDEX_VERSION_KEY)
+    return version
+
+
+class LeaveIndex:
+    """
+    Per doctor sorted interval index of approved leave days.
+
+    Overlapping and adjacent leaves are merged into inclusive (start, end)
+    ordinals, so each lookup is a single bisect. Doctors are loaded lazily, all
+    missing ones with one query, and cached for the life of the process until
+    the version key in frappe.cache changes.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        # doctor -> {"starts": [], "ends": []}
+        self._doctors = {}
+
+    def ensure(self, doctors):
+        """Load every doctor not yet indexed with a single query"""
+        missing = {d for d in doctors if d and d not in self._doctors}
+        if not missing:
+            return self
+
+        rows = frappe.db.sql(
+            """
+            SELECT doctor, leave_start, leave_end
+            FROM `tabDoctor Leave`
+            WHERE doctor IN %(doctors)s
+                AND status = 'Approved'
+                AND leave_start IS NOT NULL
+                AND leave_end IS NOT NULL
+            ORDER BY doctor, leave_start
+            """,
+            {"doctors": tuple(missing)},
+            as_dict=True,
+        )
+
+        intervals = {d: [] for d in missing}
+        for row in rows:
+            start, end = getdate(row.leave_start).toordinal(), getdate(row.leave_end).toordinal()
+            merged = intervals[row.doctor]
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            elif end >= start:
+                merged.append([start, end])
+
+        for doctor, merged in intervals.items():
+            self._doctors[doctor] = {"starts": [s for s, _ in merged], "ends": [e for _, e in merged]}
+        return self
+
+    def overlap(self, doctor, from_date, to_date=None):
+        """Return the (leave_start, leave_end) overlapping the range, or None"""
+        self.ensure([doctor])
+        day = self._doctors.get(doctor)
+        if not day or not day["starts"]:
+            return None
+
+        first = getdate(from_date).toordinal()
+        last = getdate(to_date or from_date).toordinal()
+        pos = bisect.bisect_right(day["starts"], last) - 1
+        if pos >= 0 and day["ends"][pos] >= first:
+            return date.fromordinal(day["starts"][pos]), date.fromordinal(day["ends"][pos])
+        return None
+
+    def on_leave(self, doctor_dates):
+        """
+        Return the subset of (doctor, date) pairs falling on approved leave,
+        loading any unseen doctors in one query first.
+        """
+        pairs = [(doctor, day) for doctor, day in doctor_dates if doctor and day]
+        self.ensure({doctor for doctor, _ in pairs})
+        return {(doctor, day) for doctor, day in pairs if self.overlap(doctor, day)}
+
+
+def get_leave_index():
+    """This site's leave index, rebuilt lazily when the cached version moves"""
+    site = getattr(frappe.local, "site", None)
+    version = _current_version()
+    index = _indexes.get(site)
+    if index is None or index.version != version:
+        index = _indexes[site] = LeaveIndex(version)
+    return index
+
+
+def get_leave_overlap(doctor, from_date, to_date=None):
+    """Approved leave (start, end) covering any day of the range, or None"""
+    if not doctor or not from_date:
+        return None
+    return get_leave_index().overlap(doctor, from_date, to_date)
+
+
+def get_doctors_on_leave(doctor_dates):
+    """Bulk lookup: which of the (doctor, date) pairs fall on approved leave"""
+    return get_leave_index().on_leave(doctor_dates)
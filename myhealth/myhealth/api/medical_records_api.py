@@ -1,4 +1,18 @@
+import json
+from datetime import date
+
 import frappe
+from frappe.utils import cint, nowdate
+
+from myhealth.myhealth.api.doctor_api import get_doctor_for_user
+from myhealth.myhealth.api.lab_trends_api import refresh_lab_readings
+from myhealth.myhealth.utils import bulk_insert_rows, chunked, reserve_names
+
+RECORD_TYPES = ("Consultation", "Lab Result", "Prescription", "Follow-up")
+RECORD_STATUSES = ("Draft", "Active", "Archived")
+# varchar length of the Data fields on Medical Record Detail
+DATA_FIELD_LENGTH = 140
+BULK_RECORD_CHUNK_SIZE = 100
 
 @frappe.whitelist(allow_guest=False)
 def create_medical_record(patient, appointment, doctor, record_type, summary, record_details=None, confidential=False):
@@ -29,17 +43,62 @@ def create_medical_record(patient, appointment, doctor, record_type, summary, re
     return {"message": "Medical record created", "record_id": record.name}
 
 
+def can_see_all_confidential(user):
+    return user == "Administrator" or "System Manager" in frappe.get_roles(user)
+
+
+def get_permission_query_conditions(user=None, table="`tabMedical Record`"):
+    """
+    permission_query_conditions hook: confidential records are only listed for
+    their own doctor. The session user -> doctor mapping is cached.
+    """
+    user = user or frappe.session.user
+    if can_see_all_confidential(user):
+        return ""
+    doctor = get_doctor_for_user(user)
+    if doctor:
+        return f"({table}.`confidential` = 0 OR {table}.`doctor` = {frappe.db.escape(doctor)})"
+    return f"{table}.`confidential` = 0"
+
+
+def get_lab_reading_query_conditions(user=None):
+    """Readings inherit the confidentiality of the record they came from"""
+    return get_permission_query_conditions(user, table="`tabLab Parameter Reading`")
+
+
+def has_medical_record_permission(doc, ptype=None, user=None):
+    """has_permission hook: single-document counterpart of the list condition"""
+    user = user or frappe.session.user
+    if not doc.confidential or can_see_all_confidential(user):
+        return True
+    return bool(doc.doctor) and doc.doctor == get_doctor_for_user(user)
+
+
 @frappe.whitelist(allow_guest=False)
 def get_medical_records(patient=None, doctor=None):
     """Retrieve all records for a given patient or doctor"""
-    filters = {}
+    conditions = []
+    values = {}
     if patient:
-        filters["patient"] = patient
+        conditions.append("patient = %(patient)s")
+        values["patient"] = patient
     if doctor:
-        filters["doctor"] = doctor
+        conditions.append("doctor = %(doctor)s")
+        values["doctor"] = doctor
+    confidential = get_permission_query_conditions()
+    if confidential:
+        conditions.append(confidential)
 
-    data = frappe.get_all("Medical Record", filters=filters,
-                          fields=["name", "patient", "doctor", "record_type", "record_date", "version", "status"])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    data = frappe.db.sql(
+        f"""
+        SELECT name, patient, doctor, record_type, record_date, version, status
+        FROM `tabMedical Record` {where}
+        ORDER BY creation DESC
+        """,
+        values,
+        as_dict=True,
+    )
     return {"records": data}
 
 
@@ -47,4 +106,379 @@ def get_medical_records(patient=None, doctor=None):
 def get_medical_record_details(record_id):
     """Get detailed record info"""
     record = frappe.get_doc("Medical Record", record_id)
+    if not has_medical_record_permission(record):
+        frappe.throw("Confidential record: access is restricted to the assigned doctor.", frappe.PermissionError)
     return record.as_dict()
+
+
+def _parse_bulk_records(records=None, ndjson=None):
+    """
+    Accept a list, a JSON list, or NDJSON text (argument or request body).
+    Returns the records and {index: error} for NDJSON lines that do not parse,
+    so one bad line fails only its own record.
+    """
+    if isinstance(records, str):
+        records = json.loads(records)
+    if records is not None:
+        if not isinstance(records, list):
+            frappe.throw("Medical records must be a list.")
+        return records, {}
+
+    if ndjson is None and frappe.request and "ndjson" in (frappe.request.content_type or ""):
+        ndjson = frappe.request.get_data(as_text=True)
+    if not ndjson:
+        frappe.throw("No medical records supplied.")
+
+    parsed, errors = [], {}
+    for line in ndjson.splitlines():
+        if not line.strip():
+            continue
+        try:
+            parsed.append(json.loads(line))
+        except ValueError as e:
+            errors[len(parsed)] = f"Invalid JSON: {e}"
+            parsed.append(None)
+    return parsed, errors
+
+
+def _bulk_record_error(rec, patients, doctors, appointments):
+    if not isinstance(rec, dict):
+        return "Record must be a JSON object"
+    if not rec.get("patient") or rec["patient"] not in patients:
+        return f"Patient {rec.get('patient')} does not exist"
+    if rec.get("doctor") and rec["doctor"] not in doctors:
+        return f"Doctor {rec['doctor']} does not exist"
+    if rec.get("appointment") and rec["appointment"] not in appointments:
+        return f"Appointment {rec['appointment']} does not exist"
+    if rec.get("record_type") and rec["record_type"] not in RECORD_TYPES:
+        return f"Invalid record type {rec['record_type']}"
+    # The bulk insert bypasses Select and Date validation, so check them here
+    if rec.get("status") and rec["status"] not in RECORD_STATUSES:
+        return f"Invalid status {rec['status']}"
+    if rec.get("record_date"):
+        try:
+            date.fromisoformat(str(rec["record_date"]))
+        except ValueError:
+            return f"Invalid record date {rec['record_date']}"
+    details = rec.get("record_details") or []
+    if not isinstance(details, list) or not all(isinstance(d, dict) for d in details):
+        return "record_details must be a list of objects"
+    for detail in details:
+        for field in ("parameter", "value", "unit"):
+            if len(str(detail.get(field) or "")) > DATA_FIELD_LENGTH:
+                return f"Detail {field} is longer than {DATA_FIELD_LENGTH} characters"
+    return None
+
+
+def _existing(doctype, names):
+    names = list({n for n in names if n})
+    if not names:
+        return set()
+    return set(frappe.get_all(doctype, filters={"name": ["in", names]}, pluck="name"))
+
+
+def _insert_medical_records(chunk):
+    """Bulk insert (index, record) pairs with their details and first version; returns {index: name}"""
+    user = frappe.session.user
+    names, parents, children = {}, [], []
+    for (i, rec), name in zip(chunk, reserve_names("MR.###", len(chunk)), strict=True):
+        names[i] = name
+        parents.append({
+            "name": name,
+            "patient": rec["patient"],
+            "appointment": rec.get("appointment"),
+            "doctor": rec.get("doctor"),
+            "record_type": rec.get("record_type"),
+            "summary": rec.get("summary"),
+            "record_date": rec.get("record_date") or nowdate(),
+            "confidential": cint(rec.get("confidential")),
+            "version": 1,
+            "status": rec.get("status") or "Active",
+        })
+        for idx, detail in enumerate(rec.get("record_details") or [], start=1):
+            children.append({
+                "name": frappe.generate_hash(length=10),
+                "parent": name,
+                "parenttype": "Medical Record",
+                "parentfield": "record_details",
+                "idx": idx,
+                "parameter": detail.get("parameter"),
+                "value": detail.get("value"),
+                "unit": detail.get("unit"),
+                "notes": detail.get("notes"),
+                "added_by": user,
+            })
+
+    record_children = {}
+    for child in children:
+        record_children.setdefault(child["parent"], []).append(child)
+    versions = [
+        version_row(parent["name"], 1, diff_medical_record(
+            dict(parent, record_details=record_children.get(parent["name"], []))
+        ))
+        for parent in parents
+    ]
+
+    bulk_insert_rows("Medical Record", parents)
+    bulk_insert_rows("Medical Record Detail", children)
+    bulk_insert_rows("Medical Record Version", versions)
+    refresh_lab_readings(list(names.values()))
+    return names
+
+
+@frappe.whitelist(allow_guest=False)
+def bulk_create_medical_records(records=None, ndjson=None):
+    """
+    Create many medical records (with their detail rows) in one call.
+
+    Links are validated with one query per link type, then parents and child rows
+    are bulk-inserted in chunked transactions. Returns per-record success/failure
+    in input order; a failing chunk is rolled back and retried record by record.
+    """
+    records, parse_errors = _parse_bulk_records(records, ndjson)
+
+    objects = [r for r in records if isinstance(r, dict)]
+    patients = _existing("Patient", (r.get("patient") for r in objects))
+    doctors = _existing("Doctor", (r.get("doctor") for r in objects))
+    appointments = _existing("Appointment", (r.get("appointment") for r in objects))
+
+    results = [None] * len(records)
+    valid = []
+    for i, rec in enumerate(records):
+        error = parse_errors.get(i) or _bulk_record_error(rec, patients, doctors, appointments)
+        if error:
+            results[i] = {"index": i, "success": False, "error": error}
+        else:
+            valid.append((i, rec))
+
+    for chunk in chunked(valid, BULK_RECORD_CHUNK_SIZE):
+        try:
+            names = _insert_medical_records(chunk)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            # One bad record must not sink the other 99: retry them one at a time
+            names = {}
+            for i, rec in chunk:
+                try:
+                    names.update(_insert_medical_records([(i, rec)]))
+                    frappe.db.commit()
+                except Exception as e:
+                    frappe.db.rollback()
+                    frappe.log_error(title="Bulk medical record import failed")
+                    results[i] = {"index": i, "success": False, "error": str(e)}
+        for i, name in names.items():
+            results[i] = {"index": i, "success": True, "record_id": name}
+
+    created = sum(1 for r in results if r["success"])
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+VERSIONED_FIELDS = (
+    "patient", "appointment", "doctor", "record_type", "summary",
+    "record_date", "confidential", "attachments", "status",
+)
+VERSIONED_DETAIL_FIELDS = ("parameter", "value", "unit", "notes", "added_by")
+
+
+def _comparable(value):
+    return "" if value is None else str(value)
+
+
+def _detail_rows(rows):
+    return {row.get("name"): {f: row.get(f) for f in VERSIONED_DETAIL_FIELDS} for row in rows or []}
+
+
+def diff_medical_record(doc, previous=None):
+    """
+    Compact diff between two states of a Medical Record.
+
+    Without `previous` the result is a full snapshot (marked as such) so history
+    can be replayed from it.
+    """
+    fields = {
+        f: doc.get(f) for f in VERSIONED_FIELDS
+        if previous is None or _comparable(previous.get(f)) != _comparable(doc.get(f))
+    }
+    new_rows = _detail_rows(doc.get("record_details"))
+    old_rows = _detail_rows(previous.get("record_details")) if previous else {}
+
+    details = {}
+    added = [dict(row, name=name) for name, row in new_rows.items() if name not in old_rows]
+    removed = [name for name in old_rows if name not in new_rows]
+    changed = {
+        name: {f: v for f, v in row.items() if _comparable(old_rows[name].get(f)) != _comparable(v)}
+        for name, row in new_rows.items()
+        if name in old_rows
+    }
+    changed = {name: values for name, values in changed.items() if values}
+    if added:
+        details["added"] = added
+    if removed:
+        details["removed"] = removed
+    if changed:
+        details["changed"] = changed
+
+    diff = {"snapshot": previous is None}
+    if fields:
+        diff["fields"] = fields
+    if details:
+        diff["details"] = details
+    return diff
+
+
+def get_latest_version(record_id):
+    """Highest stored version for a record, read through the (record, version) index"""
+    return frappe.db.sql(
+        "SELECT MAX(version) FROM `tabMedical Record Version` WHERE record = %s", record_id
+    )[0][0]
+
+
+def version_row(record_id, version, changes):
+    return {
+        "name": frappe.generate_hash(length=10),
+        "record": record_id,
+        "version": version,
+        "changed_by": frappe.session.user,
+        "changes": frappe.as_json(changes, indent=None),
+    }
+
+
+@frappe.whitelist(allow_guest=False)
+def get_medical_record_history(record_id):
+    """List stored versions of a record with who changed what"""
+    frappe.has_permission("Medical Record", "read", record_id, throw=True)
+    rows = frappe.get_all(
+        "Medical Record Version",
+        filters={"record": record_id},
+        fields=["version", "changed_by", "creation", "changes"],
+        order_by="version asc",
+    )
+    history = []
+    for row in rows:
+        changes = json.loads(row.changes or "{}")
+        history.append({
+            "version": row.version,
+            "changed_by": row.changed_by,
+            "changed_on": row.creation,
+            "snapshot": changes.get("snapshot", False),
+            "fields": sorted(changes.get("fields", {})),
+            "details_changed": bool(changes.get("details")),
+        })
+    return {"record_id": record_id, "versions": history}
+
+
+@frappe.whitelist(allow_guest=False)
+def get_medical_record_version(record_id, version):
+    """Rebuild a record as it was at `version` from its latest snapshot onwards"""
+    frappe.has_permission("Medical Record", "read", record_id, throw=True)
+    rows = frappe.db.sql(
+        """
+        SELECT version, changes FROM `tabMedical Record Version`
+        WHERE record = %s AND version <= %s
+        ORDER BY version ASC
+        """,
+        (record_id, cint(version)),
+        as_dict=True,
+    )
+    changes = [json.loads(row.changes or "{}") for row in rows]
+    start = max((i for i, c in enumerate(changes) if c.get("snapshot")), default=None)
+    if start is None:
+        frappe.throw(f"Version {version} of {record_id} is not available.")
+
+    fields, details = {}, {}
+    for change in changes[start:]:
+        fields.update(change.get("fields", {}))
+        for row in change.get("details", {}).get("added", []):
+            details[row["name"]] = dict(row)
+        for name in change.get("details", {}).get("removed", []):
+            details.pop(name, None)
+        for name, values in change.get("details", {}).get("changed", {}).items():
+            details.setdefault(name, {"name": name}).update(values)
+
+    return dict(fields, name=record_id, version=rows[-1].version, record_details=list(details.values()))
+
+
+TIMELINE_FIELDS = (*VERSIONED_FIELDS, "version", "modified")
+TIMELINE_DETAIL_FIELDS = ("parameter", "value", "unit", "notes")
+
+
+def _decode_timeline_cursor(cursor):
+    """Split a `record_date|name` cursor back into its keyset values"""
+    record_date, _, name = cursor.partition("|")
+    try:
+        if not name:
+            raise ValueError(cursor)
+        return date.fromisoformat(record_date), name
+    except ValueError:
+        frappe.throw("Invalid timeline cursor.")
+
+
+@frappe.whitelist(allow_guest=False)
+def get_medical_record_timeline(patient=None, doctor=None, record_type=None, status=None,
+                                from_date=None, to_date=None, fields=None,
+                                include_details=1, cursor=None, page_length=20):
+    """
+    Page through a patient's (or doctor's) records, newest first.
+
+    Uses keyset pagination on (record_date, name) and returns only the requested
+    `fields`. Detail rows for the page are loaded with one query.
+    """
+    if not patient and not doctor:
+        frappe.throw("Please specify a patient or a doctor.")
+
+    if isinstance(fields, str):
+        fields = json.loads(fields)
+    fields = [f for f in (fields or TIMELINE_FIELDS) if f in TIMELINE_FIELDS]
+    columns = ", ".join(f"`{f}`" for f in ["name", "record_date", *[f for f in fields if f != "record_date"]])
+
+    page_length = min(cint(page_length) or 20, 200)
+    conditions = []
+    values = {"limit": page_length + 1}
+    for field, value in (("patient", patient), ("doctor", doctor), ("record_type", record_type), ("status", status)):
+        if value:
+            conditions.append(f"`{field}` = %({field})s")
+            values[field] = value
+    if from_date:
+        conditions.append("record_date >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("record_date <= %(to_date)s")
+        values["to_date"] = to_date
+    if cursor:
+        values["c_date"], values["c_name"] = _decode_timeline_cursor(cursor)
+        conditions.append("(record_date < %(c_date)s OR (record_date = %(c_date)s AND name < %(c_name)s))")
+    confidential = get_permission_query_conditions()
+    if confidential:
+        conditions.append(confidential)
+
+    records = frappe.db.sql(
+        f"""
+        SELECT {columns} FROM `tabMedical Record`
+        WHERE {' AND '.join(conditions)}
+        ORDER BY record_date DESC, name DESC
+        LIMIT %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    next_cursor = None
+    if len(records) > page_length:
+        records = records[:page_length]
+        next_cursor = f"{records[-1].record_date}|{records[-1].name}"
+
+    if cint(include_details) and records:
+        details = frappe.get_all(
+            "Medical Record Detail",
+            filters={"parent": ["in", [r.name for r in records]], "parenttype": "Medical Record"},
+            fields=["parent", *TIMELINE_DETAIL_FIELDS],
+            order_by="parent asc, idx asc",
+        )
+        by_parent = {}
+        for row in details:
+            by_parent.setdefault(row.pop("parent"), []).append(row)
+        for record in records:
+            record["record_details"] = by_parent.get(record.name, [])
+
+    return {"records": records, "next_cursor": next_cursor}
@@ -1,5 +1,10 @@
+import base64
+import json
+
 import frappe
-from frappe.utils import now_datetime
+from frappe.utils import add_days, add_years, cint, getdate, now_datetime, nowdate
+
+from myhealth.myhealth.api.doctor_api import get_doctor_display_map
 
 @frappe.whitelist(allow_guest=False)
 def create_patient(first_name, last_name, age, gender, email):
@@ -44,11 +49,153 @@ def delete_patient(name):
     frappe.db.commit()
     return {"message": "Patient deleted successfully"}
 
+PATIENT_COUNT_CAP = 1000
+
+
+def dob_range_for_age(min_age=None, max_age=None):
+    """
+    Translate an age bracket into a date_of_birth range, so age filters run as
+    indexed range scans. Returns (earliest_dob, latest_dob); either may be None.
+    """
+    today = getdate(nowdate())
+    latest = add_years(today, -cint(min_age)) if min_age not in (None, "") else None
+    earliest = add_days(add_years(today, -(cint(max_age) + 1)), 1) if max_age not in (None, "") else None
+    return earliest, latest
+
+
+def refresh_patient_ages():
+    """Nightly: bring the stored age_years in line with date_of_birth in one UPDATE"""
+    frappe.db.sql(
+        """
+        UPDATE `tabPatient`
+        SET age_years = TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE())
+        WHERE date_of_birth IS NOT NULL
+            AND IFNULL(age_years, -1) != TIMESTAMPDIFF(YEAR, date_of_birth, CURDATE())
+        """
+    )
+    frappe.db.commit()
+
+
+DEFAULT_AGE_BRACKETS = "0-17,18-39,40-64,65-"
+
+
 @frappe.whitelist(allow_guest=False)
-def list_patients():
-    frappe.set_user('Administrator')
-    patients = frappe.get_all("Patient", fields=["name", "first_name", "last_name", "age", "gender", "email"])
-    return {"patients": patients}
+def get_patient_age_distribution(brackets=DEFAULT_AGE_BRACKETS):
+    """
+    Count patients per age bracket and gender with one grouped query.
+
+    `brackets` is a comma-separated list like "0-17,18-39,65-"; each is turned
+    into a date_of_birth range so the grouping never computes ages row by row.
+    """
+    frappe.has_permission("Patient", "read", throw=True)
+
+    cases = []
+    values = {}
+    labels = []
+    for i, bracket in enumerate(b.strip() for b in (brackets or DEFAULT_AGE_BRACKETS).split(",")):
+        low, _, high = bracket.partition("-")
+        earliest, latest = dob_range_for_age(low or 0, high or None)
+        parts = [f"date_of_birth <= %(latest_{i})s"]
+        values[f"latest_{i}"] = latest
+        if earliest:
+            parts.append(f"date_of_birth >= %(earliest_{i})s")
+            values[f"earliest_{i}"] = earliest
+        cases.append(f"WHEN {' AND '.join(parts)} THEN %(label_{i})s")
+        values[f"label_{i}"] = bracket
+        labels.append(bracket)
+
+    rows = frappe.db.sql(
+        f"""
+        SELECT CASE {' '.join(cases)} ELSE 'Other' END AS bracket, gender, COUNT(*) AS count
+        FROM `tabPatient`
+        WHERE date_of_birth IS NOT NULL
+        GROUP BY bracket, gender
+        """,
+        values,
+        as_dict=True,
+    )
+
+    distribution = {label: {"total": 0, "by_gender": {}} for label in labels}
+    for row in rows:
+        bucket = distribution.setdefault(row.bracket, {"total": 0, "by_gender": {}})
+        bucket["total"] += row.count
+        bucket["by_gender"][row.gender or "Not Set"] = row.count
+    return {"distribution": distribution}
+
+
+def _decode_patient_cursor(cursor):
+    try:
+        full_name, name = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return full_name, name
+    except Exception:
+        frappe.throw("Invalid patient cursor.")
+
+
+@frappe.whitelist(allow_guest=False)
+def list_patients(search=None, cursor=None, page_length=50, min_age=None, max_age=None):
+    """
+    Browse the patient directory one page at a time, ordered by full name.
+
+    `search` is a prefix match on full_name, email or phone_number (each indexed);
+    `min_age`/`max_age` become a date_of_birth range.
+    `total` is a table estimate when unfiltered and a capped count otherwise.
+    """
+    frappe.has_permission("Patient", "read", throw=True)
+
+    page_length = min(cint(page_length) or 50, 500)
+    conditions = []
+    values = {"limit": page_length + 1}
+    if search:
+        conditions.append(
+            "(full_name LIKE %(prefix)s OR email LIKE %(prefix)s OR phone_number LIKE %(prefix)s)"
+        )
+        prefix = search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        values["prefix"] = f"{prefix}%"
+
+    earliest_dob, latest_dob = dob_range_for_age(min_age, max_age)
+    if latest_dob:
+        conditions.append("date_of_birth <= %(latest_dob)s")
+        values["latest_dob"] = latest_dob
+    if earliest_dob:
+        conditions.append("date_of_birth >= %(earliest_dob)s")
+        values["earliest_dob"] = earliest_dob
+
+    filter_where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    if conditions:
+        total = frappe.db.sql(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM `tabPatient` {filter_where} LIMIT {PATIENT_COUNT_CAP}) t",
+            values,
+        )[0][0]
+        estimated = total >= PATIENT_COUNT_CAP
+    else:
+        total = frappe.db.estimate_count("Patient")
+        estimated = True
+
+    if cursor:
+        values["c_full_name"], values["c_name"] = _decode_patient_cursor(cursor)
+        conditions.append(
+            "(full_name > %(c_full_name)s OR (full_name = %(c_full_name)s AND name > %(c_name)s))"
+        )
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    patients = frappe.db.sql(
+        f"""
+        SELECT name, first_name, last_name, full_name, age, age_years, gender, email, phone_number
+        FROM `tabPatient` {where}
+        ORDER BY full_name ASC, name ASC
+        LIMIT %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    next_cursor = None
+    if len(patients) > page_length:
+        patients = patients[:page_length]
+        last = patients[-1]
+        next_cursor = base64.urlsafe_b64encode(json.dumps([last.full_name, last.name]).encode()).decode()
+
+    return {"patients": patients, "next_cursor": next_cursor, "total": total, "total_is_estimate": estimated}
 
 @frappe.whitelist(allow_guest=False)
 def upload_patient_files(patient, id_document=None, insurance_card=None):
@@ -94,16 +241,20 @@ def get_patient_doctors(patient):
         distinct=True
     )
 
+    doctor_map = get_doctor_display_map(appt.doctor for appt in appointments)
+
     doctors = []
     for appt in appointments:
-        doctor = frappe.get_doc("Doctor", appt.doctor)
+        doctor = doctor_map.get(appt.doctor)
+        if not doctor:
+            continue
         doctors.append({
-            "doctor_id": doctor.name,
-            "first_name": doctor.first_name,
-            "last_name": doctor.last_name,
-            "specialization": doctor.specialization,
-            "availability_status": doctor.availability_status,
-            "email": doctor.email
+            "doctor_id": doctor["name"],
+            "first_name": doctor["first_name"],
+            "last_name": doctor["last_name"],
+            "specialization": doctor["doctor_category"],
+            "availability_status": doctor["availability_status"],
+            "email": doctor["email"]
         })
 
     return {"patient": patient, "doctors": doctors}
@@ -129,8 +280,9 @@ def get_patient_appointments(patient):
     )
 
     # Add doctor name for display
+    doctors = get_doctor_display_map(a["doctor"] for a in appointments)
     for a in appointments:
-        a["doctor_name"] = frappe.db.get_value("Doctor", a["doctor"], "full_name")
+        a["doctor_name"] = doctors.get(a["doctor"], {}).get("full_name")
 
     return appointments
 
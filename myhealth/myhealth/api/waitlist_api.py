@@ -1,4 +1,16 @@
+import base64
+import json
+
 import frappe
+from frappe.utils import add_days, cint, getdate, now, nowdate
+
+from myhealth.myhealth.api.availability_api import get_free_slots
+from myhealth.myhealth.utils import chunked, date_key
+
+PRIORITY_RANK = {"High": 1, "Medium": 2, "Low": 3}
+DEFAULT_SWEEP_DAYS = 7
+OFFER_BATCH_SIZE = 100
+CLAIM_BATCH_SIZE = 20
 
 @frappe.whitelist(allow_guest=False)
 def create_waitlist(patient, preferred_doctor, preferred_date, notes=None, contact_email=None, priority="Medium"):
@@ -18,15 +30,99 @@ def create_waitlist(patient, preferred_doctor, preferred_date, notes=None, conta
     return {"message": "Added to waitlist successfully", "waitlist_id": doc.name}
 
 
+def _encode_cursor(row):
+    payload = json.dumps([row.priority_rank, str(row.creation), row.name])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        frappe.throw("Invalid waitlist cursor.")
+
+
 @frappe.whitelist(allow_guest=False)
-def get_waitlist(name=None):
-    """Fetch specific or all waitlist entries"""
+def get_waitlist(name=None, status="Waiting", doctor=None, from_date=None, to_date=None,
+                 priority=None, cursor=None, page_length=50):
+    """
+    Fetch a specific waitlist entry, or one page of entries.
+
+    Pages are ordered by priority then arrival and continue from `cursor`.
+    Pass status="All" to include Converted and Cancelled entries. Each page
+    carries per-status and per-priority counts for the same filters.
+    """
     if name:
         doc = frappe.get_doc("Waitlist", name)
         return doc.as_dict()
-    else:
-        data = frappe.get_all("Waitlist", fields=["name", "patient", "preferred_doctor", "preferred_date", "status", "priority"])
-        return {"waitlist": data}
+
+    page_length = min(cint(page_length) or 50, 500)
+    conditions = []
+    values = {}
+    if doctor:
+        conditions.append("preferred_doctor = %(doctor)s")
+        values["doctor"] = doctor
+    if from_date:
+        conditions.append("preferred_date >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        conditions.append("preferred_date <= %(to_date)s")
+        values["to_date"] = to_date
+
+    # Counts ignore the status/priority filters so every tab shows its total
+    count_where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    count_rows = frappe.db.sql(
+        f"""
+        SELECT status, priority, COUNT(*) AS count
+        FROM `tabWaitlist` {count_where}
+        GROUP BY status, priority
+        """,
+        values,
+        as_dict=True,
+    )
+
+    if status and status != "All":
+        conditions.append("status = %(status)s")
+        values["status"] = status
+    if priority:
+        conditions.append("priority = %(priority)s")
+        values["priority"] = priority
+
+    counts = {"by_status": {}, "by_priority": {}}
+    for row in count_rows:
+        counts["by_status"][row.status or "Not Set"] = counts["by_status"].get(row.status or "Not Set", 0) + row.count
+        if not status or status == "All" or row.status == status:
+            key = row.priority or "Not Set"
+            counts["by_priority"][key] = counts["by_priority"].get(key, 0) + row.count
+
+    if cursor:
+        values["c_rank"], values["c_creation"], values["c_name"] = _decode_cursor(cursor)
+        conditions.append(
+            """(priority_rank > %(c_rank)s
+                OR (priority_rank = %(c_rank)s AND (creation > %(c_creation)s
+                    OR (creation = %(c_creation)s AND name > %(c_name)s))))"""
+        )
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    values["limit"] = page_length + 1
+    rows = frappe.db.sql(
+        f"""
+        SELECT name, patient, preferred_doctor, preferred_date, status, priority,
+            priority_rank, contact_email, creation
+        FROM `tabWaitlist` {where}
+        ORDER BY priority_rank ASC, creation ASC, name ASC
+        LIMIT %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+    next_cursor = None
+    if len(rows) > page_length:
+        rows = rows[:page_length]
+        next_cursor = _encode_cursor(rows[-1])
+
+    return {"waitlist": rows, "next_cursor": next_cursor, "counts": counts}
 
 
 @frappe.whitelist(allow_guest=False)
@@ -47,3 +143,173 @@ def remove_waitlist(name):
     frappe.delete_doc("Waitlist", name, ignore_permissions=True)
     frappe.db.commit()
     return {"message": "Waitlist entry removed successfully"}
+
+
+def fill_contact_emails(entries):
+    """Fall back to the patient's email where an entry has none, with one plain read"""
+    patients = {e.patient for e in entries if e.patient and not e.contact_email}
+    if patients:
+        emails = dict(frappe.get_all(
+            "Patient", filters={"name": ["in", list(patients)]}, fields=["name", "email"], as_list=True
+        ))
+        for entry in entries:
+            if not entry.contact_email:
+                entry.contact_email = emails.get(entry.patient)
+    return entries
+
+
+def claim_waitlist_entry(doctor, date):
+    """
+    Atomically reserve the best reachable waiting entry for a freed doctor/date slot.
+
+    Picks by priority then arrival order from the matcher index. Rows locked by a
+    concurrent cancellation are skipped, so two cancellations never claim the
+    same entry. Entries with no email on the entry or the patient are passed
+    over and keep their place. Returns the claimed row, or None.
+    """
+    seen = []
+    while True:
+        # Lock only Waitlist rows; a patient being edited elsewhere must not hide them
+        rows = frappe.db.sql(
+            """
+            SELECT name, patient, preferred_doctor, preferred_date, contact_email
+            FROM `tabWaitlist`
+            WHERE preferred_doctor = %(doctor)s
+                AND preferred_date = %(date)s
+                AND status = 'Waiting'
+                AND name NOT IN %(seen)s
+            ORDER BY priority_rank ASC, creation ASC
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+            """,
+            {"doctor": doctor, "date": date, "seen": tuple(seen) or ("",), "limit": CLAIM_BATCH_SIZE},
+            as_dict=True,
+        )
+        if not rows:
+            return None
+
+        entry = next((e for e in fill_contact_emails(rows) if e.contact_email), None)
+        if entry:
+            frappe.db.sql(
+                "UPDATE `tabWaitlist` SET status = 'Converted', modified = %(now)s WHERE name = %(name)s",
+                {"name": entry.name, "now": now()},
+            )
+            return entry
+        seen.extend(row.name for row in rows)
+
+
+def offer_freed_slot(doctor, date, start_time=None):
+    """Claim the next waitlisted patient for a freed slot and notify them after commit"""
+    if not doctor or not date:
+        return None
+
+    entry = claim_waitlist_entry(doctor, date)
+    if entry and entry.contact_email:
+        frappe.enqueue(
+            "myhealth.myhealth.api.waitlist_api.send_waitlist_offers",
+            queue="short",
+            enqueue_after_commit=True,
+            offers=[{
+                "waitlist": entry.name,
+                "email": entry.contact_email,
+                "doctor": doctor,
+                "date": str(date),
+                "start_time": str(start_time) if start_time else None,
+            }],
+        )
+    return entry
+
+
+def send_waitlist_offers(offers):
+    """Background job: email waitlisted patients that a slot opened up"""
+    for offer in offers:
+        at = f" at {offer['start_time']}" if offer.get("start_time") else ""
+        frappe.sendmail(
+            recipients=offer["email"],
+            subject=f"Appointment Slot Available for Dr. {offer['doctor']}",
+            message=(
+                f"Hi, a slot just opened on {offer['date']}{at} with Dr. {offer['doctor']}. "
+                "Please confirm your booking soon."
+            ),
+            reference_doctype="Waitlist",
+            reference_name=offer["waitlist"],
+        )
+
+
+def sweep_waitlist(days_ahead=None):
+    """
+    Daily waitlist maintenance.
+
+    Expires Waiting entries whose preferred date has passed with one UPDATE, then
+    offers free slots in the next `days_ahead` days to the remaining entries,
+    best priority first, matching in memory per doctor/day.
+    """
+    today = getdate(nowdate())
+    days_ahead = cint(days_ahead) or cint(
+        frappe.db.get_single_value("My Health Settings", "waitlist_sweep_days")
+    ) or DEFAULT_SWEEP_DAYS
+    last_day = getdate(add_days(today, days_ahead))
+
+    frappe.db.sql(
+        """
+        UPDATE `tabWaitlist`
+        SET status = 'Expired', modified = %(now)s
+        WHERE status = 'Waiting' AND preferred_date < %(today)s
+        """,
+        {"today": today, "now": now()},
+    )
+    expired = frappe.db.sql("SELECT ROW_COUNT()")[0][0]
+
+    # Lock only Waitlist rows; patient emails are read without locks afterwards
+    waiting = fill_contact_emails(frappe.db.sql(
+        """
+        SELECT name, patient, preferred_doctor, preferred_date, contact_email
+        FROM `tabWaitlist`
+        WHERE status = 'Waiting'
+            AND preferred_doctor IS NOT NULL
+            AND preferred_date BETWEEN %(today)s AND %(last_day)s
+        ORDER BY priority_rank ASC, creation ASC
+        FOR UPDATE SKIP LOCKED
+        """,
+        {"today": today, "last_day": last_day},
+        as_dict=True,
+    ))
+
+    matched = []
+    if waiting:
+        free = get_free_slots(sorted({w.preferred_doctor for w in waiting}), today, last_day)
+        for entry in waiting:
+            # Unreachable entries stay Waiting rather than silently losing their place
+            if not entry.contact_email:
+                continue
+            # entries arrive in priority order, so each takes the earliest slot left
+            day_slots = free.get(entry.preferred_doctor, {}).get(date_key(entry.preferred_date))
+            if day_slots:
+                matched.append((entry, day_slots.pop(0)))
+
+    for chunk in chunked([entry.name for entry, _ in matched], OFFER_BATCH_SIZE):
+        frappe.db.sql(
+            "UPDATE `tabWaitlist` SET status = 'Converted', modified = %(now)s WHERE name IN %(names)s",
+            {"names": tuple(chunk), "now": now()},
+        )
+
+    offers = [
+        {
+            "waitlist": entry.name,
+            "email": entry.contact_email,
+            "doctor": entry.preferred_doctor,
+            "date": date_key(entry.preferred_date),
+            "start_time": slot["start_time"],
+        }
+        for entry, slot in matched
+    ]
+    for batch in chunked(offers, OFFER_BATCH_SIZE):
+        frappe.enqueue(
+            "myhealth.myhealth.api.waitlist_api.send_waitlist_offers",
+            queue="short",
+            enqueue_after_commit=True,
+            offers=batch,
+        )
+    frappe.db.commit()
+
+    return {"expired": expired, "matched": len(matched)}
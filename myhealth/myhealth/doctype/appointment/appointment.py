@@ -3,29 +3,102 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import add_days, nowdate
+
+from myhealth.myhealth.api.appointment_api import (
+    get_slot_conflicts,
+    update_status_counter,
+    validate_slot_times,
+)
+from myhealth.myhealth.api.availability_api import clear_slot_cache
+from myhealth.myhealth.api.doctor_api import update_appointment_stats
+from myhealth.myhealth.api.leave_index import get_leave_overlap
+from myhealth.myhealth.api.waitlist_api import offer_freed_slot
 
 
 class Appointment(Document):
     def validate(self):
-        """Prevent double booking for the same doctor/time slot"""
-        conflict = frappe.db.exists(
-            "Appointment",
-            {
-                "doctor": self.doctor,
-                "appointment_date": self.appointment_date,
-                "start_time": self.start_time,
-                "end_time": self.end_time,
-                "status": ["!=", "Cancelled"],
-                "name": ["!=", self.name],
-            },
+        """Prevent bookings on approved leave and overlapping bookings for the same doctor"""
+        self.clear_leave_displacement()
+        if not (self.doctor and self.appointment_date and self.start_time and self.end_time):
+            return
+        if not self.holds_slot():
+            return
+        # Status-only edits must not trip over overlaps already in the data
+        previous = self.get_doc_before_save()
+        if previous and previous.holds_slot() and not self.slot_changed(previous):
+            return
+
+        leave = get_leave_overlap(self.doctor, self.appointment_date)
+        if leave:
+            frappe.throw(
+                f"Doctor {self.doctor} is on approved leave from {leave[0]} to {leave[1]}. "
+                "Please select another date or doctor."
+            )
+
+        validate_slot_times(self.start_time, self.end_time)
+        conflicts = get_slot_conflicts(
+            self.doctor, self.appointment_date, self.start_time, self.end_time, exclude=[self.name]
         )
 
-        if conflict:
+        if conflicts:
             frappe.throw(
-                f"Doctor {self.doctor} already has another appointment at this time."
+                f"Doctor {self.doctor} already has another appointment at this time ({', '.join(conflicts)})."
             )
 
+    def holds_slot(self):
+        """Cancelled bookings, and ones still parked on a leave day, do not claim their slot"""
+        return "Cancelled" not in (self.status, self.service_status) and not self.displaced_by_leave
+
+    def slot_changed(self, previous):
+        return any(
+            str(previous.get(field) or "") != str(self.get(field) or "")
+            for field in ("doctor", "appointment_date", "start_time", "end_time")
+        )
+
+    def clear_leave_displacement(self):
+        """A booking released by a leave becomes live again once it is moved"""
+        previous = self.get_doc_before_save()
+        if not self.displaced_by_leave or not previous:
+            return
+        if (previous.doctor, str(previous.appointment_date), str(previous.start_time)) != (
+            self.doctor, str(self.appointment_date), str(self.start_time)
+        ):
+            self.displaced_by_leave = None
+            self.reminder_sent = 0
+
+    def on_update(self):
+        self.invalidate_slot_cache()
+        self.update_status_counters()
+        self.offer_slot_if_cancelled()
+        self.update_doctor_stats()
+
+    def on_trash(self):
+        self.invalidate_slot_cache()
+        update_status_counter(self.service_status, -1)
+
+    def after_delete(self):
+        update_appointment_stats(self, None)
+
+    def update_doctor_stats(self):
+        """Move this booking's contribution in the doctor stats counters"""
+        update_appointment_stats(self.get_doc_before_save(), self)
+
+    def update_status_counters(self):
+        """Keep the materialized service_status counters in step with this row"""
+        previous = self.get_doc_before_save()
+        if not previous:
+            update_status_counter(self.service_status, 1)
+        elif previous.service_status != self.service_status:
+            update_status_counter(previous.service_status, -1)
+            update_status_counter(self.service_status, 1)
+
+    def invalidate_slot_cache(self):
+        """Drop cached free slots for this booking's doctor/day (and the old one if it moved)"""
+        clear_slot_cache(self.doctor, [self.appointment_date])
+        previous = self.get_doc_before_save()
+        if previous and (previous.doctor, previous.appointment_date) != (self.doctor, self.appointment_date):
+            clear_slot_cache(previous.doctor, [previous.appointment_date])
+
     def on_submit(self):
         """Send confirmation email after appointment submission"""
         if not getattr(self, "confirmation_sent", 0):
@@ -38,64 +111,21 @@ class Appointment(Document):
             self.db_set("confirmation_sent", 1)
 
     def on_cancel(self):
-        """When appointment is cancelled, check for waitlisted patients"""
-        waitlisted = frappe.get_all(
-            "Waitlist",
-            filters={
-                "preferred_doctor": self.doctor,
-                "preferred_date": self.appointment_date,
-                "status": "Waiting",
-            },
-            fields=["name", "patient", "contact_email"],
-        )
+        """When appointment is cancelled, offer the slot to the waitlist"""
+        offer_freed_slot(self.doctor, self.appointment_date, self.start_time)
 
-        if waitlisted:
-            next_patient = waitlisted[0]
-            frappe.sendmail(
-                recipients=next_patient.contact_email,
-                subject=f"Appointment Slot Available for Dr. {self.doctor}",
-                message=f"Hi, a slot just opened for your preferred date with Dr. {self.doctor}. Please confirm your booking soon.",
-            )
-            frappe.db.set_value("Waitlist", next_patient.name, "status", "Converted")
-
-
-def send_appointment_reminders():
-    """Send reminders for tomorrow's appointments"""
-    tomorrow = add_days(nowdate(), 1)
-    appointments = frappe.get_all(
-        "Appointment",
-        filters={"appointment_date": tomorrow, "reminder_sent": 0, "status": "Scheduled"},
-        fields=[
-            "name",
-            "patient_email",
-            "doctor_name",
-            "appointment_date",
-            "start_time",
-            "end_time",
-        ],
-    )
-
-    for appt in appointments:
-        frappe.sendmail(
-            recipients=appt.patient_email,
-            subject=f"Reminder: Appointment with Dr. {appt.doctor_name} Tomorrow",
-            message=f"Reminder: You have an appointment on {appt.appointment_date} at {appt.start_time}.",
-        )
-        frappe.db.set_value("Appointment", appt.name, "reminder_sent", 1)
-
-
-def create_recurring_appointments():
-    """Auto-create next occurrence for recurring appointments"""
-    rec = frappe.get_all("Appointment", filters={"is_recurring": 1}, fields=["*"])
-    for r in rec:
-        new_date = add_days(r.appointment_date, int(r.recurrence_interval))
-        frappe.get_doc({
-            "doctype": "Appointment",
-            "patient": r.patient,
-            "doctor": r.doctor,
-            "appointment_date": new_date,
-            "start_time": r.start_time,
-            "end_time": r.end_time,
-            "service": r.service,
-            "status": "Scheduled",
-        }).insert(ignore_permissions=True)
+    def offer_slot_if_cancelled(self):
+        """Cancellation here is a status change, so detect the transition on save"""
+        previous = self.get_doc_before_save()
+        was_cancelled = previous and "Cancelled" in (previous.status, previous.service_status)
+        if "Cancelled" in (self.status, self.service_status) and previous and not was_cancelled:
+            offer_freed_slot(self.doctor, self.appointment_date, self.start_time)
+
+
+def on_doctype_update():
+    """Composite index backing the per doctor/date conflict lookups"""
+    frappe.db.add_index("Appointment", ["doctor", "appointment_date", "start_time"])
+    # Unique-patient checks in the doctor stats
+    frappe.db.add_index("Appointment", ["doctor", "patient"])
+    # Upcoming occurrences of each recurring series
+    frappe.db.add_index("Appointment", ["recurrence_parent", "appointment_date"])
@@ -1,9 +1,10 @@
 # Copyright (c) 2025, Karen and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from myhealth.myhealth.api.appointment_api import BookedSlotIndex, get_slot_conflicts
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -11,6 +12,7 @@ from frappe.tests import IntegrationTestCase
 EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
+TEST_DATE = "2099-01-05"
 
 
 class IntegrationTestAppointment(IntegrationTestCase):
@@ -19,4 +21,93 @@ class IntegrationTestAppointment(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.doctor = frappe.get_doc(
+			{
+				"doctype": "Doctor",
+				"first_name": "Slot",
+				"last_name": "Tester",
+				"email": "slot.tester@example.com",
+			}
+		).insert(ignore_permissions=True)
+		cls.patient = frappe.get_doc(
+			{"doctype": "Patient", "first_name": "Slot", "last_name": "Patient"}
+		).insert(ignore_permissions=True)
+
+	def make_appointment(self, start_time, end_time, **kwargs):
+		return frappe.get_doc(
+			{
+				"doctype": "Appointment",
+				"doctor": self.doctor.name,
+				"patient": self.patient.name,
+				"appointment_date": TEST_DATE,
+				"start_time": start_time,
+				"end_time": end_time,
+				"service_status": "Pending",
+				**kwargs,
+			}
+		).insert(ignore_permissions=True)
+
+	def test_adjacent_slots_do_not_conflict(self):
+		index = BookedSlotIndex()
+		index.add("DOC-1", TEST_DATE, "09:00:00", "09:30:00", "A")
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "09:30:00", "10:00:00"), [])
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "08:30:00", "09:00:00"), [])
+
+	def test_overlapping_slots_conflict(self):
+		index = BookedSlotIndex()
+		index.add("DOC-1", TEST_DATE, "09:00:00", "09:30:00", "A")
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "09:15:00", "09:45:00"), ["A"])
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "08:45:00", "09:15:00"), ["A"])
+
+	def test_contained_and_containing_slots_conflict(self):
+		index = BookedSlotIndex()
+		index.add("DOC-1", TEST_DATE, "09:00:00", "11:00:00", "LONG")
+		index.add("DOC-1", TEST_DATE, "13:00:00", "13:15:00", "SHORT")
+		# A slot fully inside a long booking, found through the running max end
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "10:00:00", "10:15:00"), ["LONG"])
+		# A slot wrapping a short booking
+		self.assertEqual(index.conflicts("DOC-1", TEST_DATE, "12:30:00", "14:00:00"), ["SHORT"])
+
+	def test_other_doctor_or_day_does_not_conflict(self):
+		index = BookedSlotIndex()
+		index.add("DOC-1", TEST_DATE, "09:00:00", "09:30:00", "A")
+		self.assertEqual(index.conflicts("DOC-2", TEST_DATE, "09:00:00", "09:30:00"), [])
+		self.assertEqual(index.conflicts("DOC-1", "2099-01-06", "09:00:00", "09:30:00"), [])
+
+	def test_get_slot_conflicts_reads_booked_appointments(self):
+		booked = self.make_appointment("10:00:00", "10:30:00")
+		self.assertEqual(
+			get_slot_conflicts(self.doctor.name, TEST_DATE, "10:15:00", "10:45:00"), [booked.name]
+		)
+		self.assertEqual(get_slot_conflicts(self.doctor.name, TEST_DATE, "10:30:00", "11:00:00"), [])
+		# The appointment being edited never conflicts with itself
+		self.assertEqual(
+			get_slot_conflicts(self.doctor.name, TEST_DATE, "10:00:00", "10:30:00", exclude=[booked.name]),
+			[],
+		)
+
+	def test_cancelled_appointments_free_the_slot(self):
+		self.make_appointment("14:00:00", "14:30:00", status="Cancelled")
+		self.make_appointment("15:00:00", "15:30:00", service_status="Cancelled")
+		self.assertEqual(get_slot_conflicts(self.doctor.name, TEST_DATE, "14:00:00", "14:30:00"), [])
+		self.assertEqual(get_slot_conflicts(self.doctor.name, TEST_DATE, "15:00:00", "15:30:00"), [])
+
+	def test_overlapping_booking_is_rejected(self):
+		self.make_appointment("16:00:00", "16:30:00")
+		self.assertRaises(frappe.ValidationError, self.make_appointment, "16:15:00", "16:45:00")
+
+	def test_status_edit_allowed_on_legacy_overlap(self):
+		self.make_appointment("17:00:00", "17:30:00")
+		second = self.make_appointment("17:30:00", "18:00:00")
+		# Overlap left behind by the old exact-duplicate check
+		frappe.db.set_value("Appointment", second.name, "start_time", "17:15:00")
+
+		second.reload()
+		second.status = "Completed"
+		second.save(ignore_permissions=True)
+
+		second.end_time = "18:15:00"
+		self.assertRaises(frappe.ValidationError, second.save, ignore_permissions=True)
@@ -1,16 +1,37 @@
 import frappe
 from frappe.model.document import Document
 
+from myhealth.myhealth.api.doctor_api import (
+    DOCTOR_SEARCH_INDEX,
+    build_search_text,
+    clear_doctor_cache,
+    doctor_full_name,
+)
+
 
 class Doctor(Document):
     def validate(self):
         """
         Keep full_name synced with first_name + last_name
         """
-        if self.first_name and self.last_name:
-            self.full_name = f"Dr.{self.first_name} {self.last_name}"
-        elif self.first_name:
-            self.full_name = f"Dr.{self.first_name}"
-        else:
-            self.full_name = "Dr.Unknown"
+        self.full_name = doctor_full_name(self.first_name, self.last_name)
+        self.search_text = build_search_text(self)
+
+    def on_update(self):
+        clear_doctor_cache(self.name)
+
+    def on_trash(self):
+        clear_doctor_cache(self.name)
+        # The stats row links back to this doctor and would block the delete
+        frappe.db.delete("Doctor Stats", {"doctor": self.name})
+
 
+def on_doctype_update():
+    """
+    Full-text index behind the doctor directory's token-prefix search, and
+    name indexes for the tokens the full-text index cannot see
+    """
+    frappe.db.add_index("Doctor", ["first_name"])
+    frappe.db.add_index("Doctor", ["last_name"])
+    if not frappe.db.has_index("tabDoctor", DOCTOR_SEARCH_INDEX):
+        frappe.db.sql_ddl(f"ALTER TABLE `tabDoctor` ADD FULLTEXT INDEX `{DOCTOR_SEARCH_INDEX}` (search_text)")
@@ -1,9 +1,10 @@
 # Copyright (c) 2025, Karen and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from myhealth.myhealth.api.doctor_api import _search_condition, list_doctors
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -19,4 +20,39 @@ class IntegrationTestDoctor(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.li = cls.make_doctor("Wei", "Li", "wei.li@example.com")
+		cls.ng = cls.make_doctor("Lina", "Ng", "lina.ng@example.com")
+		cls.other = cls.make_doctor("Oskar", "Berg", "oskar.berg@example.com")
+
+	@classmethod
+	def make_doctor(cls, first_name, last_name, email):
+		return frappe.get_doc(
+			{"doctype": "Doctor", "first_name": first_name, "last_name": last_name, "email": email}
+		).insert(ignore_permissions=True)
+
+	def search(self, text):
+		return {d.name for d in list_doctors(search=text, page_length=100)["doctors"]}
+
+	def test_two_letter_surname_search(self):
+		found = self.search("Li")
+		# "Li" prefixes Wei Li's surname and Lina Ng's first name
+		self.assertIn(self.li.name, found)
+		self.assertIn(self.ng.name, found)
+		self.assertNotIn(self.other.name, found)
+
+		found = self.search("Ng")
+		self.assertIn(self.ng.name, found)
+		self.assertNotIn(self.li.name, found)
+
+	def test_title_does_not_match_every_doctor(self):
+		self.assertNotIn(self.li.name, self.search("dr"))
+
+	def test_short_tokens_filter_full_text_matches(self):
+		values = {}
+		condition = _search_condition("Li cardio", values)
+		self.assertIn("MATCH(search_text)", condition)
+		self.assertIn("first_name LIKE %(name_prefix_0)s", condition)
+		self.assertEqual(values, {"terms": "+cardio*", "name_prefix_0": "li%"})
@@ -4,6 +4,19 @@
 # import frappe
 from frappe.model.document import Document
 
+from myhealth.myhealth.api.availability_api import clear_slot_cache
+
 
 class DoctorAvailability(Document):
-	pass
+	def on_update(self):
+		self.invalidate_slot_cache()
+
+	def on_trash(self):
+		self.invalidate_slot_cache()
+
+	def invalidate_slot_cache(self):
+		"""Drop cached free slots for this block's doctor/day (and the old one if it moved)"""
+		clear_slot_cache(self.doctor, [self.date])
+		previous = self.get_doc_before_save()
+		if previous and (previous.doctor, previous.date) != (self.doctor, self.date):
+			clear_slot_cache(previous.doctor, [previous.date])
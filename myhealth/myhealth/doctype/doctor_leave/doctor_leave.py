@@ -4,6 +4,27 @@
 # import frappe
 from frappe.model.document import Document
 
+from myhealth.myhealth.api.availability_api import clear_slot_cache
+from myhealth.myhealth.api.doctor_api import update_leave_stats
+from myhealth.myhealth.api.leave_index import invalidate_leave_index
+
 
 class DoctorLeave(Document):
-	pass
+	def on_update(self):
+		self.invalidate_slot_cache()
+		invalidate_leave_index()
+		update_leave_stats(self.get_doc_before_save(), self)
+
+	def on_trash(self):
+		self.invalidate_slot_cache()
+		invalidate_leave_index()
+
+	def after_delete(self):
+		update_leave_stats(self, None)
+
+	def invalidate_slot_cache(self):
+		"""A leave can span many days, so drop every cached day for the doctor"""
+		clear_slot_cache(self.doctor)
+		previous = self.get_doc_before_save()
+		if previous and previous.doctor != self.doctor:
+			clear_slot_cache(previous.doctor)
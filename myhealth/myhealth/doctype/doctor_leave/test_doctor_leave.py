@@ -1,9 +1,18 @@
 # Copyright (c) 2025, Karen and Contributors
 # See license.txt
 
-# import frappe
+from datetime import date
+
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from myhealth.myhealth.api.leave_index import (
+	LeaveIndex,
+	bump_leave_index_version,
+	get_doctors_on_leave,
+	get_leave_index,
+	get_leave_overlap,
+)
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,11 +21,98 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
-
 class IntegrationTestDoctorLeave(IntegrationTestCase):
 	"""
 	Integration tests for DoctorLeave.
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.doctor = frappe.get_doc(
+			{
+				"doctype": "Doctor",
+				"first_name": "Leave",
+				"last_name": "Tester",
+				"email": "leave.tester@example.com",
+			}
+		).insert(ignore_permissions=True)
+		# Adjacent and overlapping leaves merge into 1-10 March
+		for start, end, status in (
+			("2099-03-01", "2099-03-05", "Approved"),
+			("2099-03-06", "2099-03-08", "Approved"),
+			("2099-03-07", "2099-03-10", "Approved"),
+			("2099-04-01", "2099-04-02", "Approved"),
+			("2099-05-01", "2099-05-31", "Pending"),
+		):
+			cls.make_leave(start, end, status)
+
+	@classmethod
+	def make_leave(cls, leave_start, leave_end, status="Approved"):
+		return frappe.get_doc(
+			{
+				"doctype": "Doctor Leave",
+				"doctor": cls.doctor.name,
+				"leave_type": "Vacation",
+				"leave_start": leave_start,
+				"leave_end": leave_end,
+				"status": status,
+			}
+		).insert(ignore_permissions=True)
+
+	def test_overlapping_and_adjacent_leaves_merge(self):
+		index = LeaveIndex().ensure([self.doctor.name])
+		self.assertEqual(index.overlap(self.doctor.name, "2099-03-09"), (date(2099, 3, 1), date(2099, 3, 10)))
+		self.assertEqual(index.overlap(self.doctor.name, "2099-04-02"), (date(2099, 4, 1), date(2099, 4, 2)))
+
+	def test_lookups_at_leave_boundaries(self):
+		doctor = self.doctor.name
+		self.assertIsNone(get_leave_overlap(doctor, "2099-02-28"))
+		self.assertIsNotNone(get_leave_overlap(doctor, "2099-03-01"))
+		self.assertIsNotNone(get_leave_overlap(doctor, "2099-03-10"))
+		self.assertIsNone(get_leave_overlap(doctor, "2099-03-11"))
+		self.assertIsNone(get_leave_overlap(doctor, "2099-03-31"))
+
+	def test_range_overlap(self):
+		doctor = self.doctor.name
+		# Range ending on the first leave day, or starting on the last one
+		self.assertIsNotNone(get_leave_overlap(doctor, "2099-02-20", "2099-03-01"))
+		self.assertIsNotNone(get_leave_overlap(doctor, "2099-04-02", "2099-04-20"))
+		# Range sitting in the gap between two leaves
+		self.assertIsNone(get_leave_overlap(doctor, "2099-03-11", "2099-03-31"))
+
+	def test_pending_leave_is_ignored(self):
+		self.assertIsNone(get_leave_overlap(self.doctor.name, "2099-05-15"))
+
+	def test_bulk_lookup(self):
+		doctor = self.doctor.name
+		pairs = [
+			(doctor, "2099-03-03"),
+			(doctor, "2099-03-20"),
+			(doctor, "2099-04-01"),
+			("Unknown", "2099-03-03"),
+		]
+		self.assertEqual(get_doctors_on_leave(pairs), {(doctor, "2099-03-03"), (doctor, "2099-04-01")})
+
+	def test_version_bump_rebuilds_index(self):
+		index = get_leave_index()
+		self.assertIs(get_leave_index(), index)
+		bump_leave_index_version()
+		self.assertIsNot(get_leave_index(), index)
+
+	def test_saving_a_leave_invalidates_index(self):
+		doctor = self.doctor.name
+		self.assertIsNone(get_leave_overlap(doctor, "2099-06-10"))
+
+		leave = self.make_leave("2099-06-08", "2099-06-12")
+		self.assertIsNotNone(get_leave_overlap(doctor, "2099-06-10"))
+
+		leave.status = "Rejected"
+		leave.save(ignore_permissions=True)
+		self.assertIsNone(get_leave_overlap(doctor, "2099-06-10"))
+
+		leave.status = "Approved"
+		leave.save(ignore_permissions=True)
+		leave.delete(ignore_permissions=True)
+		self.assertIsNone(get_leave_overlap(doctor, "2099-06-10"))
@@ -0,0 +1,8 @@
+// Copyright (c) 2025, Karen and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Lab Parameter Reading", {
+// 	refresh(frm) {
+
+// 	},
+// });
@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Karen and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LabParameterReading(Document):
+	pass
+
+
+def on_doctype_update():
+	"""Trend reads scan one patient's parameter in date order"""
+	frappe.db.add_index("Lab Parameter Reading", ["patient", "parameter", "record_date"])
@@ -1,17 +1,44 @@
 import frappe
 from frappe.model.document import Document
+from frappe.utils import nowdate
+
+from myhealth.myhealth.api.lab_trends_api import refresh_lab_readings
+from myhealth.myhealth.api.medical_records_api import (
+    diff_medical_record,
+    get_latest_version,
+    version_row,
+)
+from myhealth.myhealth.utils import bulk_insert_rows
+
 
 class MedicalRecord(Document):
     def before_insert(self):
         # Auto-assign version number
         self.version = 1
+        if not self.record_date:
+            self.record_date = nowdate()
 
     def before_save(self):
-        # Versioning logic
+        # Versioning logic: the version store is the source of truth
         if not self.is_new():
-            current_version = frappe.db.get_value("Medical Record", self.name, "version")
-            self.version = (current_version or 1) + 1
+            latest = get_latest_version(self.name)
+            previous = self.get_doc_before_save()
+            # Records saved before the store existed start their history with a snapshot
+            self.flags.version_snapshot = latest is None
+            self.version = (latest or (previous and previous.version) or 1) + 1
+
+    def on_update(self):
+        """Append a compact diff of this save to the version store"""
+        previous = None if self.flags.version_snapshot else self.get_doc_before_save()
+        changes = diff_medical_record(self, previous)
+        bulk_insert_rows("Medical Record Version", [version_row(self.name, self.version, changes)])
+        refresh_lab_readings([self.name])
+
+    def on_trash(self):
+        frappe.db.delete("Lab Parameter Reading", {"medical_record": self.name})
+
 
-    def validate(self):
-        if self.confidential and not frappe.session.user == self.doctor:
-            frappe.msgprint("⚠️ Confidential record: Access restricted to assigned doctor only.")
+def on_doctype_update():
+    """Keyset pagination for patient/doctor timelines walks (record_date, name)"""
+    frappe.db.add_index("Medical Record", ["patient", "record_date", "name"])
+    frappe.db.add_index("Medical Record", ["doctor", "record_date", "name"])
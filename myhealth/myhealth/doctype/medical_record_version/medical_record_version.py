@@ -0,0 +1,14 @@
+# Copyright (c) 2025, Karen and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class MedicalRecordVersion(Document):
+	pass
+
+
+def on_doctype_update():
+	"""(record, version) lookups for history and point-in-time reads"""
+	frappe.db.add_unique("Medical Record Version", ["record", "version"], constraint_name="record_version")
@@ -0,0 +1,115 @@
+# Copyright (c) 2025, Karen and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from myhealth.myhealth.api.medical_records_api import (
+	VERSIONED_FIELDS,
+	diff_medical_record,
+	get_medical_record_history,
+	get_medical_record_version,
+)
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+
+def details_of(record):
+	return sorted(
+		(row.get("parameter"), row.get("value"), row.get("unit")) for row in record.get("record_details") or []
+	)
+
+
+class IntegrationTestMedicalRecordVersion(IntegrationTestCase):
+	"""
+	Integration tests for MedicalRecordVersion.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.patient = frappe.get_doc(
+			{"doctype": "Patient", "first_name": "Version", "last_name": "Patient"}
+		).insert(ignore_permissions=True)
+
+	def test_diff_medical_record(self):
+		previous = frappe._dict(
+			summary="Initial",
+			status="Draft",
+			record_details=[
+				{"name": "row1", "parameter": "HbA1c", "value": "7.2", "unit": "%"},
+				{"name": "row2", "parameter": "LDL", "value": "130", "unit": "mg/dL"},
+			],
+		)
+		current = frappe._dict(
+			summary="Revised",
+			status="Draft",
+			record_details=[
+				{"name": "row1", "parameter": "HbA1c", "value": "6.9", "unit": "%"},
+				{"name": "row3", "parameter": "HDL", "value": "45", "unit": "mg/dL"},
+			],
+		)
+
+		diff = diff_medical_record(current, previous)
+		self.assertFalse(diff["snapshot"])
+		self.assertEqual(diff["fields"], {"summary": "Revised"})
+		self.assertEqual(diff["details"]["changed"], {"row1": {"value": "6.9"}})
+		self.assertEqual(diff["details"]["removed"], ["row2"])
+		self.assertEqual([row["name"] for row in diff["details"]["added"]], ["row3"])
+
+		snapshot = diff_medical_record(current)
+		self.assertTrue(snapshot["snapshot"])
+		self.assertEqual(set(snapshot["fields"]), set(VERSIONED_FIELDS))
+
+		self.assertEqual(diff_medical_record(current, current), {"snapshot": False})
+
+	def test_versions_replay_to_the_original(self):
+		record = frappe.get_doc(
+			{
+				"doctype": "Medical Record",
+				"patient": self.patient.name,
+				"record_type": "Lab Result",
+				"summary": "Initial panel",
+				"record_date": "2099-02-01",
+				"record_details": [
+					{"parameter": "HbA1c", "value": "7.2", "unit": "%"},
+					{"parameter": "LDL", "value": "130", "unit": "mg/dL"},
+				],
+			}
+		).insert(ignore_permissions=True)
+		original = {f: record.get(f) for f in VERSIONED_FIELDS}
+		original_details = details_of(record)
+
+		record.summary = "Revised panel"
+		record.record_details[0].value = "6.9"
+		record.remove(record.record_details[1])
+		record.append("record_details", {"parameter": "HDL", "value": "45", "unit": "mg/dL"})
+		record.save(ignore_permissions=True)
+
+		record.summary = "Final panel"
+		record.save(ignore_permissions=True)
+
+		history = get_medical_record_history(record.name)["versions"]
+		self.assertEqual([v["version"] for v in history], [1, 2, 3])
+		self.assertTrue(history[0]["snapshot"])
+		self.assertEqual(history[1]["fields"], ["summary"])
+		self.assertTrue(history[1]["details_changed"])
+
+		first = get_medical_record_version(record.name, 1)
+		self.assertEqual(first["version"], 1)
+		for field, value in original.items():
+			self.assertEqual(str(first.get(field) or ""), str(value or ""), field)
+		self.assertEqual(details_of(first), original_details)
+
+		second = get_medical_record_version(record.name, 2)
+		self.assertEqual(second["summary"], "Revised panel")
+		self.assertEqual(details_of(second), [("HDL", "45", "mg/dL"), ("HbA1c", "6.9", "%")])
+
+		latest = get_medical_record_version(record.name, 3)
+		self.assertEqual(latest["summary"], "Final panel")
+		self.assertEqual(details_of(latest), details_of(record))
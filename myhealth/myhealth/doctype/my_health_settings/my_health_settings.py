@@ -4,6 +4,12 @@
 # import frappe
 from frappe.model.document import Document
 
+from myhealth.myhealth.api.appointment_api import rebuild_status_counters
+
 
 class MyHealthSettings(Document):
-	pass
+	def on_update(self):
+		# Counters are not maintained while disabled, so recount when switched on
+		previous = self.get_doc_before_save()
+		if self.use_appointment_counters and not (previous and previous.use_appointment_counters):
+			rebuild_status_counters()
@@ -15,6 +15,7 @@ class Patient(Document):
 
             # Calculate age
             self.age = self.calculate_age(dob)
+            self.age_years = self.calculate_age_years(dob)
 
 			  # --- Phone Number ---
         if self.phone_number and not self.phone_number.isdigit():
@@ -44,6 +45,11 @@ class Patient(Document):
 
         return f"{years} years, {months} months"
 
+    def calculate_age_years(self, dob):
+        """Return completed years, matching TIMESTAMPDIFF(YEAR, dob, CURDATE())."""
+        today = date.today()
+        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
     def _parse_date(self, dob):
         """Ensure dob is always a datetime.date object."""
         if isinstance(dob, str):
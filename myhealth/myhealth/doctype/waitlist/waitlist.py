@@ -4,6 +4,8 @@
 import frappe
 from frappe.model.document import Document
 
+from myhealth.myhealth.api.waitlist_api import PRIORITY_RANK
+
 
 class Waitlist(Document):
     def validate(self):
@@ -11,3 +13,20 @@ class Waitlist(Document):
         if not self.status:
             self.status = "Waiting"
 
+        # Numeric rank so the matcher index can order by priority
+        self.priority_rank = PRIORITY_RANK.get(self.priority, PRIORITY_RANK["Medium"])
+
+
+def on_doctype_update():
+    """Ordered indexes for slot matching and paged listing"""
+    frappe.db.add_index(
+        "Waitlist",
+        ["preferred_doctor", "preferred_date", "status", "priority_rank", "creation"],
+        index_name="waitlist_match_index",
+    )
+    # Front desk listing: status filter, then priority/arrival keyset order
+    frappe.db.add_index(
+        "Waitlist",
+        ["status", "priority_rank", "creation"],
+        index_name="waitlist_listing_index",
+    )
@@ -33,6 +33,7 @@ frappe.pages['doctor-dashboard'].on_page_load = function(wrapper) {
     $(wrapper).find('.layout-main-section').html(html);
 
     // --- FULLCALENDAR INIT ---
+    const eventCache = {};
     $('#calendar').fullCalendar({
         header: {
             left: 'prev,next today',
@@ -42,16 +43,29 @@ frappe.pages['doctor-dashboard'].on_page_load = function(wrapper) {
         height: 700,
         weekends: true,
         events: function(start, end, timezone, callback) {
+            // Re-visiting a window only fetches appointments changed since the last load
+            const key = `${start.format('YYYY-MM-DD')}|${end.format('YYYY-MM-DD')}`;
+            const entry = eventCache[key] || { events: {}, last_modified: null };
+
             frappe.call({
                 method: "myhealth.myhealth.api.appointment_api.get_calendar_events",
-                args: {},
+                args: {
+                    start: start.format('YYYY-MM-DD'),
+                    end: end.format('YYYY-MM-DD'),
+                    updated_since: entry.last_modified
+                },
                 callback: function(r) {
-                    if (!r.message) {
-                        callback([]);
-                        return;
-                    }
+                    (r.message || []).forEach(e => {
+                        // Tombstones: deleted or moved out of this window
+                        if (e.removed) delete entry.events[e.name];
+                        else entry.events[e.name] = e;
+                        if (!entry.last_modified || e.modified > entry.last_modified) {
+                            entry.last_modified = e.modified;
+                        }
+                    });
+                    eventCache[key] = entry;
 
-                    let events = r.message.map(e => {
+                    let events = Object.values(entry.events).map(e => {
                         // Color based on status
                         let color = "#4B9CD3"; // default: appointment
                         if (e.status === "Completed") color = "#81C784";
@@ -100,6 +114,8 @@ frappe.pages['doctor-dashboard'].on_page_load = function(wrapper) {
         frappe.set_route('List', 'Doctor Leave', { doctor: frappe.session.user });
     });
     $(wrapper).on('click', '.refresh-calendar', function() {
+        // A manual refresh reloads every window from scratch
+        Object.keys(eventCache).forEach(key => delete eventCache[key]);
         $('#calendar').fullCalendar('refetchEvents');
         frappe.show_alert("🔄 Calendar refreshed");
     });
@@ -239,6 +239,12 @@ myHealthPatientPortal.bookAppointmentView = function() {
                         <label for="appointment-date">Date</label>
                         <input type="date" id="appointment-date" class="form-control">
                     </div>
+                    <div class="col-12 form-group">
+                        <label for="slot-dropdown">Available Slots</label>
+                        <select id="slot-dropdown" class="form-control">
+                            <option value="">Select a doctor and date</option>
+                        </select>
+                    </div>
                     <div class="col-6 form-group">
                         <label for="start-time">Start Time</label>
                         <input type="time" id="start-time" class="form-control">
@@ -280,6 +286,41 @@ myHealthPatientPortal.bookAppointmentView = function() {
         }
     });
 
+    // Load free slots for the selected doctor/date
+    const slotDropdown = this.container.find("#slot-dropdown")[0];
+    function loadSlots() {
+        const doctor = doctorDropdown.value;
+        const date = myHealthPatientPortal.container.find("#appointment-date").val();
+        slotDropdown.innerHTML = '<option value="">Select a doctor and date</option>';
+        if (!doctor || !date) return;
+
+        frappe.call({
+            method: "myhealth.myhealth.api.availability_api.get_available_slots",
+            args: { doctor: doctor, from_date: date, to_date: date },
+            callback: function(r) {
+                const slots = (r.message && r.message.slots[doctor] && r.message.slots[doctor][date]) || [];
+                slotDropdown.innerHTML = slots.length
+                    ? '<option value="">Choose a time</option>'
+                    : '<option value="">No free slots on this day</option>';
+                slots.forEach(slot => {
+                    const opt = document.createElement("option");
+                    opt.value = `${slot.start_time}|${slot.end_time}`;
+                    opt.text = `${slot.start_time.slice(0, 5)} - ${slot.end_time.slice(0, 5)}`;
+                    slotDropdown.add(opt);
+                });
+            }
+        });
+    }
+
+    doctorDropdown.addEventListener("change", loadSlots);
+    this.container.find("#appointment-date").on('change', loadSlots);
+    slotDropdown.addEventListener("change", () => {
+        if (!slotDropdown.value) return;
+        const [start, end] = slotDropdown.value.split("|");
+        myHealthPatientPortal.container.find("#start-time").val(start.slice(0, 5));
+        myHealthPatientPortal.container.find("#end-time").val(end.slice(0, 5));
+    });
+
     // Book new appointment handler
     bookBtn.addEventListener("click", () => {
         const date = myHealthPatientPortal.container.find("#appointment-date").val();
@@ -0,0 +1,64 @@
+from datetime import time, timedelta
+
+import frappe
+from frappe.utils import get_timedelta, getdate, now
+
+
+def to_seconds(value):
+    """Return a Time field value (timedelta, time or "HH:MM[:SS]") as seconds since midnight"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    return int(get_timedelta(str(value)).total_seconds())
+
+
+def format_seconds(seconds):
+    """Return seconds since midnight as an "HH:MM:SS" string"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def date_key(value):
+    """Normalise a Date field value to its "YYYY-MM-DD" string form"""
+    return str(getdate(value))
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def reserve_names(series, count):
+    """
+    Reserve `count` consecutive names from an old-style naming series such as
+    "APT.###" with a single counter update, for rows inserted in bulk.
+    """
+    prefix, hashes = series.rsplit(".", 1)
+    frappe.db.sql(
+        "INSERT INTO `tabSeries` (name, current) VALUES (%s, 0) ON DUPLICATE KEY UPDATE name = name",
+        prefix,
+    )
+    current = frappe.db.sql("SELECT current FROM `tabSeries` WHERE name = %s FOR UPDATE", prefix)[0][0]
+    frappe.db.sql("UPDATE `tabSeries` SET current = %s WHERE name = %s", (current + count, prefix))
+    return [f"{prefix}{str(current + i).zfill(len(hashes))}" for i in range(1, count + 1)]
+
+
+def bulk_insert_rows(doctype, rows):
+    """
+    Insert plain dicts (each carrying its `name`) in one statement, bypassing the
+    document lifecycle. Standard columns are filled in; callers own validation.
+    """
+    if not rows:
+        return
+    timestamp, user = now(), frappe.session.user
+    standard = {"creation": timestamp, "modified": timestamp, "owner": user, "modified_by": user, "docstatus": 0}
+    fields = sorted({key for row in rows for key in row} | set(standard))
+    values = [tuple(row.get(f, standard.get(f)) for f in fields) for row in rows]
+    frappe.db.bulk_insert(doctype, fields, values)
@@ -0,0 +1,5 @@
+from myhealth.myhealth.api.lab_trends_api import backfill_lab_readings
+
+
+def execute():
+    backfill_lab_readings()
@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+    """Fill the directory search column for doctors saved before it existed"""
+    frappe.db.sql(
+        """
+        UPDATE `tabDoctor`
+        SET search_text = CONCAT_WS(' ', first_name, last_name, department, doctor_category)
+        """
+    )
@@ -0,0 +1,8 @@
+import frappe
+
+
+def execute():
+    """Records created without a record_date sort by creation date in the timeline"""
+    frappe.db.sql(
+        "UPDATE `tabMedical Record` SET record_date = DATE(creation) WHERE record_date IS NULL"
+    )
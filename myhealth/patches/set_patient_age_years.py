@@ -0,0 +1,5 @@
+from myhealth.myhealth.api.patient_api import refresh_patient_ages
+
+
+def execute():
+    refresh_patient_ages()
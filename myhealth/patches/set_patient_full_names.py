@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    """The patient directory pages on full_name, so it must never be empty"""
+    frappe.db.sql(
+        """
+        UPDATE `tabPatient`
+        SET full_name = COALESCE(NULLIF(TRIM(CONCAT_WS(' ', first_name, last_name)), ''), 'Unknown')
+        WHERE full_name IS NULL OR full_name = ''
+        """
+    )
@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+    """Backfill Waitlist.priority_rank so existing entries sort in the matcher index"""
+    frappe.db.sql(
+        """
+        UPDATE `tabWaitlist`
+        SET priority_rank = CASE priority WHEN 'High' THEN 1 WHEN 'Low' THEN 3 ELSE 2 END
+        """
+    )